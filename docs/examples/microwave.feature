@@ -31,4 +31,12 @@ Feature: microwave
     Then state heating.on should be active
     When I wait 1 second 3 times
     Then state heating.on should not be active
-    And event ding should be fired
\ No newline at end of file
+    And event ding should be fired
+
+  Scenario: Microwave bells when it stops heating, using simulated time
+    Given I reproduce "Microwave starts"
+    When I fast-forward 4 seconds
+    Then state heating.on should be active
+    When I fast-forward 1 second
+    Then state heating.on should not be active
+    And event ding should be fired
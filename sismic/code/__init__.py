@@ -1,5 +1,5 @@
 from .evaluator import Evaluator
 from .dummy import DummyEvaluator
-from .python import PythonEvaluator
+from .python import PythonEvaluator, CodeCache
 
-__all__ = ['Evaluator', 'DummyEvaluator', 'PythonEvaluator']
\ No newline at end of file
+__all__ = ['Evaluator', 'DummyEvaluator', 'PythonEvaluator', 'CodeCache']
\ No newline at end of file
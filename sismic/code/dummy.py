@@ -1,5 +1,5 @@
 from .evaluator import Evaluator
-from typing import Mapping
+from typing import Any, Mapping
 
 __all__ = ['DummyEvaluator']
 
@@ -16,6 +16,12 @@ class DummyEvaluator(Evaluator):
     def context(self):
         return dict()
 
+    def snapshot(self) -> Any:
+        return None
+
+    def restore(self, state: Any) -> None:
+        return
+
     def _evaluate_code(self, code: str, *, additional_context: Mapping=None) -> bool:
         return True
 
@@ -1,7 +1,7 @@
 import abc
 from sismic.model import ActionStateMixin
 from sismic.model import Event, Transition, StateMixin, Statechart
-from typing import cast, Iterator, Mapping
+from typing import cast, Any, Iterator, Mapping, Optional
 
 __all__ = ['Evaluator']
 
@@ -57,6 +57,36 @@ class Evaluator(metaclass=abc.ABCMeta):
         """
         raise NotImplementedError()
 
+    def next_deadline(self) -> Optional[float]:
+        """
+        Return the earliest time (greater than the current time) at which the evaluation of a guard could change
+        only because of the elapsed time, or None if there is no such time (or if this is not supported by
+        this evaluator, which is the default).
+
+        :return: a time value or None
+        """
+        return None
+
+    def snapshot(self) -> Any:
+        """
+        Return the runtime state of this evaluator (eg. its context), as a value that can be pickled and
+        that is later passed to *restore*. This method is used by *Interpreter.snapshot*.
+
+        :return: a picklable value
+        :raise NotImplementedError: if this evaluator does not support snapshots (default)
+        """
+        raise NotImplementedError('{} does not support snapshots'.format(self.__class__.__name__))
+
+    def restore(self, state: Any) -> None:
+        """
+        Restore a runtime state that was returned by *snapshot*.
+        This method is used by *Interpreter.restore*.
+
+        :param state: a value returned by *snapshot*
+        :raise NotImplementedError: if this evaluator does not support snapshots (default)
+        """
+        raise NotImplementedError('{} does not support snapshots'.format(self.__class__.__name__))
+
     def execute_statechart(self, statechart: Statechart) -> None:
         """
         Execute the initial code of a statechart.
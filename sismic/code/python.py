@@ -1,24 +1,228 @@
-from types import CodeType
-from functools import partial
-from typing import Dict, Iterator, cast, Any, Mapping, MutableMapping
+from types import CodeType, ModuleType
+from functools import partial, lru_cache
+from typing import Dict, Iterator, cast, Any, Mapping, MutableMapping, MutableSet, List, Optional, Set, Tuple, \
+    FrozenSet, Iterable
 from itertools import chain
+import ast
 import collections
 import copy
+import hashlib
+import importlib.util
+import marshal
+import os
+import sys
+import threading
+import weakref
 
 from .evaluator import Evaluator
 from sismic.model import Event, InternalEvent, Transition, StateMixin, Statechart
 from sismic.exceptions import CodeEvaluationError
 
-__all__ = ['PythonEvaluator']
+__all__ = ['PythonEvaluator', 'CodeCache']
+
+
+class CodeCache:
+    """
+    A bounded cache of compiled code, with a least-recently-used eviction policy.
+
+    Code objects are identified by their source code and their compilation mode (either 'eval' or 'exec').
+    This cache can be used by many threads at once.
+    If a *directory* is provided, compiled code is also stored in (and loaded from) this directory using
+    *marshal*, so that it is not compiled again by subsequent processes. Files that cannot be loaded
+    (eg. because they were written by another version of Python) are ignored and overwritten.
+
+    :param maxsize: maximal number of code objects that are kept in memory
+    :param directory: optional path to an existing directory for the on-disk cache
+    """
+    def __init__(self, maxsize: int=1024, directory: str=None) -> None:
+        self.maxsize = maxsize
+        self.directory = directory
+
+        self._codes = collections.OrderedDict()  # type: collections.OrderedDict[Tuple[str, str], CodeType]
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def compile(self, code: str, mode: str) -> CodeType:
+        """
+        Return the compiled version of given code.
+
+        :param code: code to compile
+        :param mode: either 'eval' or 'exec'
+        :return: a code object
+        :raise SyntaxError: if the code cannot be compiled
+        """
+        key = (code, mode)
+        with self._lock:
+            compiled_code = self._codes.get(key, None)
+            if compiled_code is not None:
+                self.hits += 1
+                self._codes.move_to_end(key)
+                return compiled_code
+            self.misses += 1
+
+        compiled_code = self._load(code, mode) if self.directory else None
+        if compiled_code is None:
+            compiled_code = compile(code, '<string>', mode)
+            if self.directory:
+                self._dump(code, mode, compiled_code)
+
+        with self._lock:
+            self._codes[key] = compiled_code
+            while len(self._codes) > self.maxsize:
+                self._codes.popitem(last=False)
+        return compiled_code
+
+    def clear(self) -> None:
+        """
+        Remove all the code objects that are kept in memory. The on-disk cache is left untouched.
+        """
+        with self._lock:
+            self._codes.clear()
+            self.hits = self.misses = 0
+
+    def _path_for(self, code: str, mode: str) -> str:
+        """
+        Return the path of the file that contains the compiled version of given code.
+        The name of the file depends on the version of Python, as marshal format is not portable.
+
+        :param code: source code
+        :param mode: compilation mode
+        :return: a path
+        """
+        digest = hashlib.sha1(importlib.util.MAGIC_NUMBER + mode.encode() + b'\0' + code.encode())
+        return os.path.join(self.directory, digest.hexdigest() + '.marshal')
+
+    def _load(self, code: str, mode: str) -> Optional[CodeType]:
+        """
+        Return the compiled code stored in the on-disk cache, or None if it cannot be loaded.
+
+        :param code: source code
+        :param mode: compilation mode
+        :return: a code object or None
+        """
+        try:
+            with open(self._path_for(code, mode), 'rb') as f:
+                compiled_code = marshal.load(f)
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+        return compiled_code if isinstance(compiled_code, CodeType) else None
+
+    def _dump(self, code: str, mode: str, compiled_code: CodeType) -> None:
+        """
+        Store given compiled code in the on-disk cache. Errors are silently ignored, as
+        this cache is only an optimization.
+
+        :param code: source code
+        :param mode: compilation mode
+        :param compiled_code: code object to store
+        """
+        path = self._path_for(code, mode)
+        tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+        try:
+            with open(tmp_path, 'wb') as f:
+                marshal.dump(compiled_code, f)
+            os.replace(tmp_path, path)
+        except OSError:
+            pass
+
+    def __len__(self) -> int:
+        return len(self._codes)
+
+    def __repr__(self):
+        return '{}(maxsize={}, directory={!r})'.format(self.__class__.__name__, self.maxsize, self.directory)
+
+
+@lru_cache(maxsize=1024)
+def _old_names(conditions: Tuple[str, ...]) -> Optional[FrozenSet[str]]:
+    """
+    Return the names that are accessed through *__old__* in given conditions (eg. *x* for *__old__.x*),
+    or None if *__old__* is used in another way in (or if it cannot be determined for) some condition.
+
+    :param conditions: pieces of code
+    :return: a set of names or None
+    """
+    names = set()
+    for condition in conditions:
+        try:
+            tree = ast.parse(condition, mode='eval')
+        except SyntaxError:
+            return None
+
+        attributes = set()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name) and node.value.id == '__old__':
+                attributes.add(id(node.value))
+                names.add(node.attr)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Name) and node.id == '__old__' and id(node) not in attributes:
+                return None
+    return frozenset(names)
+
+
+# Functions that can be called in an invariant without preventing it from being skipped, see _invariant_dependencies
+_PURE_FUNCTIONS = frozenset([
+    'abs', 'all', 'any', 'bool', 'dict', 'float', 'frozenset', 'int', 'isinstance', 'len', 'list', 'max', 'min',
+    'round', 'set', 'sorted', 'str', 'sum', 'tuple',
+])
+
+
+@lru_cache(maxsize=1024)
+def _invariant_dependencies(condition: str) -> Optional[Tuple[FrozenSet[str], bool]]:
+    """
+    Return the names that are read by given condition, and whether it calls *active*, or None if the value of the
+    condition could change even if none of these names is assigned and the active configuration does not change
+    (eg. if it depends on *time* or calls an arbitrary function).
+
+    :param condition: piece of code
+    :return: a pair (set of names, Boolean) or None
+    """
+    try:
+        tree = ast.parse(condition, mode='eval')
+    except SyntaxError:
+        return None
+
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name):
+            if node.id == 'time':
+                return None
+            names.add(node.id)
+        elif isinstance(node, ast.Call):
+            if not isinstance(node.func, ast.Name) or node.func.id not in _PURE_FUNCTIONS | {'active'}:
+                return None
+    names.discard('__old__')  # Does not change while the state is active
+    return frozenset(names), 'active' in names
+
+
+class _WriteJournal:
+    """
+    Record, for each name, when it was last assigned or deleted in any context of a tree of contexts.
+    """
+    __slots__ = ('stamps', 'counter')
+
+    def __init__(self) -> None:
+        self.stamps = {}  # type: Dict[Any, int]
+        self.counter = 0
+
+    def touch(self, key) -> None:
+        self.counter += 1
+        self.stamps[key] = self.counter
 
 
 class FrozenContext(collections.Mapping):
     """
     A shallow copy of a context. The keys of the underlying context are
     exposed as attributes.
+
+    :param context: the context to copy
+    :param names: if provided, only these names are copied (names that are not in the context are ignored)
     """
-    def __init__(self, context: Mapping) -> None:
-        self.__frozencontext = {k: copy.copy(v) for k, v in context.items()}
+    def __init__(self, context: Mapping, names: Iterable[str]=None) -> None:
+        if names is None:
+            self.__frozencontext = {k: copy.copy(v) for k, v in context.items()}
+        else:
+            self.__frozencontext = {k: copy.copy(context[k]) for k in names if k in context}
 
     def __getattr__(self, item):
         try:
@@ -42,6 +246,11 @@ class Context(collections.MutableMapping):
 
     Borrowed and corrected from http://code.activestate.com/recipes/577434/
 
+    Each context remembers which of its maps holds a given name (or that no map holds it), so that
+    looking up a name does not depend on the depth of the context. These entries are checked before they are
+    used, or discarded when a new name is added to a context that has nested contexts. As a consequence,
+    the maps should only be modified through the contexts, except for removing names.
+
     :param data: Optional initial dict
     :param parent: Parent context, if any
     """
@@ -51,6 +260,16 @@ class Context(collections.MutableMapping):
         self.maps = [self.map]
         if parent is not None:
             self.maps += parent.maps
+            parent._has_children = True
+            self._generation = parent._generation
+            self._journal = parent._journal
+        else:
+            self._generation = [0]  # Shared by all the contexts of the same tree
+            self._journal = None  # type: Optional[_WriteJournal]  # Shared as well, see PythonEvaluator
+
+        self._has_children = False
+        self._owners = {}  # type: Dict[Any, Optional[MutableMapping]]  # name -> map that holds it, or None
+        self._owners_generation = self._generation[0]
 
     def new_child(self, data: Mapping=None) -> 'Context':
         """
@@ -68,40 +287,130 @@ class Context(collections.MutableMapping):
         """
         return self if self.parent is None else self.parent.root
 
-    def __getitem__(self, key):
-        m = self.map
+    def _owner(self, key) -> Optional[MutableMapping]:
+        """
+        Return the nearest map that holds given name, or None.
+
+        :param key: a name
+        :return: a map or None
+        """
+        if self._owners_generation != self._generation[0]:
+            # A name was added to a context with nested contexts
+            self._owners.clear()
+            self._owners_generation = self._generation[0]
+        else:
+            m = self._owners.get(key, self)  # Use self as a default value, as None means "no map"
+            if m is None or (m is not self and key in m):
+                return m
+
         for m in self.maps:
             if key in m:
                 break
+        else:
+            m = None
+        self._owners[key] = m
+        return m
+
+    def __getitem__(self, key):
+        m = self._owner(key)
+        if m is None:
+            raise KeyError(key)
         return m[key]
 
     def __setitem__(self, key, value) -> None:
-        for m in self.maps:
-            if key in m:
-                m[key] = value
-                return
-        self.map[key] = value
+        if self._journal is not None:
+            self._journal.touch(key)
+        m = self._owner(key)
+        if m is None:
+            m = self.map
+            if self._has_children:
+                self._generation[0] += 1
+            else:
+                self._owners[key] = m
+        m[key] = value
 
     def __delitem__(self, key) -> None:
-        for m in self.maps:
-            if key in m:
-                del m[key]
-                return
-        del self.map[key]
+        if self._journal is not None:
+            self._journal.touch(key)
+        m = self._owner(key)
+        if m is None:
+            raise KeyError(key)
+        del m[key]
 
     def __len__(self) -> int:
-        return len(set(*chain(m.keys() for m in self.maps)))
+        return len(set(chain.from_iterable(self.maps)))
 
     def __iter__(self):
-        return chain.from_iterable(self.maps)
+        seen = set()
+        for key in chain.from_iterable(self.maps):
+            if key not in seen:
+                seen.add(key)
+                yield key
 
     def __contains__(self, key) -> bool:
-        return any(key in m for m in self.maps)
+        return self._owner(key) is not None
 
     def __repr__(self) -> str:
         return ' -> '.join(map(repr, self.maps))
 
 
+class _ModuleReference:
+    """
+    Stand for a module in the snapshot of a context, as modules can be neither pickled nor copied.
+
+    :param name: name of the module
+    """
+    __slots__ = ('name',)
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+
+def _export_map(data: Mapping) -> Dict[Any, Any]:
+    """
+    Return a copy of given mapping in which modules are replaced by references, see *_import_map*.
+
+    :param data: a mapping
+    :return: a new dictionary
+    """
+    return {k: _ModuleReference(v.__name__) if isinstance(v, ModuleType) else v for k, v in data.items()}
+
+
+def _import_map(data: Mapping) -> Dict[Any, Any]:
+    """
+    Return a copy of given mapping in which module references are replaced by the modules, see *_export_map*.
+
+    :param data: a mapping returned by *_export_map*
+    :return: a new dictionary
+    """
+    return {
+        k: importlib.import_module(v.name) if isinstance(v, _ModuleReference) else v for k, v in data.items()
+    }
+
+
+class _TransitionScope:
+    """
+    Data that are allocated once for all to evaluate the guards and to execute the actions of the
+    transitions of a state, see *PythonEvaluator.evaluate_guard* and *PythonEvaluator.execute_action*.
+
+    Each piece of code is given a local context that is cleared before its evaluation. As a consequence,
+    the variables it defines are not visible from other pieces of code, as if a new child context was created.
+    Guards are evaluated with *guard_globals* as their globals, as expressions cannot assign global names.
+    Actions are executed with a copy of *action_globals*, so that the functions they define keep the values
+    of *time* and *event* of their execution, and that *global* assignments are not shared.
+
+    :param context: a child of the context of the state, used as local context
+    :param guard_globals: exposed values for the guards
+    :param action_globals: exposed values for the actions
+    """
+    __slots__ = ('context', 'guard_globals', 'action_globals')
+
+    def __init__(self, context: Context, guard_globals: Dict[str, Any], action_globals: Dict[str, Any]) -> None:
+        self.context = context
+        self.guard_globals = guard_globals
+        self.action_globals = action_globals
+
+
 class PythonEvaluator(Evaluator):
     """
     A code evaluator that understands Python.
@@ -127,7 +436,8 @@ class PythonEvaluator(Evaluator):
     - On postcondition or invariant:
         - A variable *__old__* that has an attribute *x* for every *x* in the context when either the state
           was entered (if the condition involves a state) or the transition was processed (if the condition
-          involves a transition). The value of *__old__.x* is a shallow copy of *x* at that time.
+          involves a transition). The value of *__old__.x* is a shallow copy of *x* at that time. If *__old__*
+          is only used to access attributes in the conditions, only the corresponding variables are copied.
 
     If an exception occurred while executing or evaluating a piece of code, it is propagated by the
     evaluator.
@@ -138,33 +448,66 @@ class PythonEvaluator(Evaluator):
     variable that is defined in the context of the parent state. The context of a transition is built upon the context
     of its source state.
 
+    Compiled code is shared by all the instances of this class, using the *CodeCache* instance
+    that is stored in its *code_cache* class attribute. The code objects of a statechart are also kept
+    as long as this statechart exists, so that they are never evicted from the cache while they are used.
+
+    If *skip_unchanged_invariants* is set, the invariants of a state are not evaluated again if none of the
+    variables they read was assigned (or deleted) since their last (successful) evaluation, and if the active
+    configuration did not change in case they call *active*. Invariants that call other functions than
+    usual builtins or that depend on *time* are always evaluated. Notice that in-place modifications of
+    mutable values (eg. *x.append(1)*) are not detected. The *evaluated_invariants* and *skipped_invariants*
+    attributes count the invariants that were evaluated and skipped.
+
     :param interpreter: the interpreter that will use this evaluator,
         is expected to be an *Interpreter* instance
     :param initial_context: a dictionary that will be used as *__locals__*
+    :param skip_unchanged_invariants: set to True to skip the evaluation of the invariants of states whose
+        variables did not change.
     """
 
-    def __init__(self, interpreter=None, *, initial_context: Mapping=None) -> None:
+    # Shared by all the instances, see CodeCache
+    code_cache = CodeCache()
+    # Statechart -> code objects used by the evaluators of that statechart, see _compile
+    _statechart_codes = weakref.WeakKeyDictionary()  # type: MutableMapping[Statechart, Dict[Tuple[str, str], CodeType]]
+    # Statecharts that were already precompiled by execute_statechart
+    _precompiled_statecharts = weakref.WeakSet()  # type: MutableSet[Statechart]
+
+    def __init__(self, interpreter=None, *, initial_context: Mapping=None,
+                 skip_unchanged_invariants: bool=False) -> None:
         super().__init__()
 
         self._context = Context(initial_context)
         self._interpreter = interpreter
 
-        self.__memory = {}  # type: Dict[int, Mapping]
+        # Invariants of states that can be skipped, see evaluate_invariants
+        self.skip_unchanged_invariants = skip_unchanged_invariants
+        self.evaluated_invariants = 0
+        self.skipped_invariants = 0
+        self.__configuration_version = 0  # Incremented each time a state is entered or exited
+        self.__invariant_stamps = {}  # type: Dict[str, Dict[str, Tuple[int, int]]]  # state -> invariant -> stamps
+        if skip_unchanged_invariants:
+            self._context._journal = _WriteJournal()
+
+        self.__memory = {}  # type: Dict[Any, Mapping]  # see __memory_key
         self.__entry_time = {}  # type: Dict[str, float]
         self.__idle_time = {}  # type: Dict[str, float]
 
-        self.__evaluable_code = {}  # type: Dict[str, CodeType]
-        self.__executable_code = {}  # type: Dict[str, CodeType]
-        self.__contexts = {}  # type: Dict[str, Context]
+        # Deadlines of after/idle calls that were not yet satisfied, see next_deadline.
+        # There is at most one pending deadline per call, the last one that was computed.
+        # (name, idle, seconds) -> (deadline, since)
+        self.__deadlines = {}  # type: Dict[Tuple[str, bool, float], Tuple[float, float]]
 
-        if getattr(interpreter, 'statechart', None) is not None:
-            # Initialize nested contexts
-            sc = self._interpreter.statechart  # type: Statechart
+        # Nested contexts are created on demand, see context_for
+        self.__contexts = {}  # type: Dict[str, Context]
+        self.__scopes = {}  # type: Dict[str, _TransitionScope]
 
-            self.__contexts[sc.root] = self._context.new_child()
-            for name in sc.descendants_for(sc.root):
-                parent_name = sc.parent_for(name)
-                self.__contexts[name] = self.__contexts[parent_name].new_child()
+        # Code objects used by this evaluator, shared with the other evaluators of the same statechart
+        statechart = getattr(interpreter, 'statechart', None)
+        if statechart is None:
+            self.__codes = {}  # type: Dict[Tuple[str, str], CodeType]
+        else:
+            self.__codes = PythonEvaluator._statechart_codes.setdefault(statechart, {})
 
     @property
     def context(self) -> Context:
@@ -173,10 +516,17 @@ class PythonEvaluator(Evaluator):
     def context_for(self, name: str) -> Context:
         """
         Context object for given state name.
+        The context of a state (and the ones of its ancestors) is created the first time it is needed.
+
         :param name: State name
         :return: Context object
         """
-        return self.__contexts[name]
+        context = self.__contexts.get(name, None)
+        if context is None:
+            parent_name = self._interpreter.statechart.parent_for(name)
+            parent = self._context if parent_name is None else self.context_for(parent_name)
+            context = self.__contexts.setdefault(name, parent.new_child())
+        return context
 
     def __send(self, name: str, **kwargs):
         """
@@ -194,7 +544,8 @@ class PythonEvaluator(Evaluator):
         :param name: name of a state
         :return: True if given state name is active.
         """
-        return name in self._interpreter.configuration
+        # The raw configuration offers constant-time membership tests, and does not need to be ordered
+        return name in self._interpreter._configuration
 
     def __after(self, name: str, seconds: float) -> bool:
         """
@@ -204,7 +555,7 @@ class PythonEvaluator(Evaluator):
         :param seconds: elapsed time
         :return: True if given state was entered more than *seconds* ago.
         """
-        return self._interpreter.time - seconds >= self.__entry_time[name]
+        return self.__check_deadline(name, False, seconds, self.__entry_time[name])
 
     def __idle(self, name: str, seconds: float) -> bool:
         """
@@ -214,7 +565,118 @@ class PythonEvaluator(Evaluator):
         :param seconds: elapsed time
         :return: True if given state was the target of a transition more than *seconds* ago.
         """
-        return self._interpreter.time - seconds >= self.__idle_time[name]
+        return self.__check_deadline(name, True, seconds, self.__idle_time[name])
+
+    def __check_deadline(self, name: str, idle: bool, seconds: float, since: float) -> bool:
+        """
+        Return True if *seconds* elapsed since *since*. Otherwise, register the time at which this will be
+        the case (see *next_deadline*) in place of the one previously computed for the same call.
+
+        :param name: name of the state the deadline is related to
+        :param idle: True if the deadline is related to the idle time of the state, False for its entry time
+        :param seconds: elapsed time
+        :param since: entry (or idle) time of the state
+        :return: True if *seconds* elapsed since *since*.
+        """
+        if self._interpreter.time - seconds >= since:
+            return True
+
+        # Due to rounding errors, *since + seconds* may not satisfy the above test
+        deadline = since + seconds
+        while deadline - seconds < since:
+            deadline += abs(deadline) * 2 * sys.float_info.epsilon or sys.float_info.min
+        self.__deadlines[(name, idle, seconds)] = (deadline, since)
+        return False
+
+    def next_deadline(self) -> Optional[float]:
+        """
+        Return the earliest time (greater than the current time) at which a call to *after* or *idle* that
+        returned False during the last evaluations of the guards would return True, or None if there is no
+        such time.
+
+        Deadlines whose state was exited (or re-entered, or had a transition processed for an *idle* call)
+        since their registration are discarded.
+
+        :return: a time value or None
+        """
+        time = self._interpreter.time
+        earliest = None  # type: Optional[float]
+        for key, (deadline, since) in list(self.__deadlines.items()):
+            name, idle, _ = key
+            times = self.__idle_time if idle else self.__entry_time
+            if deadline > time and times.get(name, None) == since and name in self._interpreter._configuration:
+                earliest = deadline if earliest is None else min(earliest, deadline)
+            else:
+                del self.__deadlines[key]
+        return earliest
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Return the runtime state of this evaluator, including the values of the variables of its contexts.
+        These values should be picklable for *Interpreter.snapshot* to succeed, except for modules that are
+        referred to by their name (and imported again by *restore*).
+
+        The values held for *__old__* in the postconditions and invariants of transitions are not included, as
+        they are only relevant while a transition is processed.
+
+        :return: a dictionary that can be passed to *restore*
+        """
+        journal = self._context._journal
+        return {
+            'context': _export_map(self._context.map),
+            'contexts': {name: _export_map(context.map) for name, context in self.__contexts.items()},
+            'memory': {key: _export_map(values) for key, values in self.__memory.items() if isinstance(key, str)},
+            'entry_time': dict(self.__entry_time),
+            'idle_time': dict(self.__idle_time),
+            'deadlines': dict(self.__deadlines),
+            'configuration_version': self.__configuration_version,
+            'invariant_stamps': {name: dict(stamps) for name, stamps in self.__invariant_stamps.items()},
+            'journal': None if journal is None else (dict(journal.stamps), journal.counter),
+        }
+
+    def restore(self, state: Mapping[str, Any]) -> None:
+        """
+        Restore a runtime state that was returned by *snapshot*.
+        The contexts of this evaluator are replaced, so that previously obtained contexts are no longer used.
+
+        :param state: a dictionary returned by *snapshot*
+        """
+        self._context = Context(_import_map(state['context']))
+        if self.skip_unchanged_invariants:
+            self._context._journal = _WriteJournal()
+            if state['journal'] is not None:
+                stamps, self._context._journal.counter = state['journal']
+                self._context._journal.stamps.update(stamps)
+
+        self.__contexts = {}
+        self.__scopes = {}
+        for name, values in state['contexts'].items():
+            self.context_for(name).map.update(_import_map(values))
+
+        self.__memory = {key: FrozenContext(_import_map(values)) for key, values in state['memory'].items()}
+        self.__entry_time = dict(state['entry_time'])
+        self.__idle_time = dict(state['idle_time'])
+
+        self.__deadlines = dict(state['deadlines'])
+
+        self.__configuration_version = state['configuration_version']
+        self.__invariant_stamps = {name: dict(stamps) for name, stamps in state['invariant_stamps'].items()}
+
+    def _compile(self, code: str, mode: str) -> CodeType:
+        """
+        Return the compiled version of given code. Code objects are obtained from *code_cache*, and are
+        kept for the statechart of this evaluator so that they cannot be evicted while they are in use.
+
+        :param code: code to compile
+        :param mode: either 'eval' or 'exec'
+        :return: a code object
+        :raise SyntaxError: if the code cannot be compiled
+        """
+        key = (code, mode)
+        compiled_code = self.__codes.get(key, None)
+        if compiled_code is None:
+            compiled_code = self.__codes.setdefault(key, self.code_cache.compile(code, mode))
+        return compiled_code
 
     def _evaluate_code(self, code: str, *, additional_context: Mapping=None, context: Context=None) -> bool:
         """
@@ -230,9 +692,7 @@ class PythonEvaluator(Evaluator):
         if context is None:
             context = self._context
 
-        compiled_code = self.__evaluable_code.get(code, None)
-        if compiled_code is None:
-            compiled_code = self.__evaluable_code.setdefault(code, compile(code, '<string>', 'eval'))
+        compiled_code = self._compile(code, 'eval')
 
         exposed_context = {
             'active': self.__active,
@@ -258,9 +718,7 @@ class PythonEvaluator(Evaluator):
         if context is None:
             context = self._context
 
-        compiled_code = self.__executable_code.get(code, None)
-        if compiled_code is None:
-            compiled_code = self.__executable_code.setdefault(code, compile(code, '<string>', 'exec'))
+        compiled_code = self._compile(code, 'exec')
 
         exposed_context = {
             'active': self.__active,
@@ -274,17 +732,94 @@ class PythonEvaluator(Evaluator):
         except Exception as e:
             raise CodeEvaluationError('The above exception occurred while executing:\n{}'.format(code)) from e
 
+    def precompile(self, statechart: Statechart) -> None:
+        """
+        Compile every piece of code of given statechart (preamble, guards, actions, on entry and on exit
+        code, and contracts) and store the result in the shared code cache.
+
+        :param statechart: statechart to consider
+        :raise CodeEvaluationError: if some code cannot be compiled. The message lists all of them.
+        """
+        codes = [('preamble', statechart.preamble, 'exec')]
+        for name in statechart.states:
+            state = statechart.state_for(name)
+            owner = 'state {}'.format(name)
+            codes.append(('on entry of ' + owner, getattr(state, 'on_entry', None), 'exec'))
+            codes.append(('on exit of ' + owner, getattr(state, 'on_exit', None), 'exec'))
+            codes.extend(self.__contract_codes(owner, state))
+        for transition in statechart.transitions:
+            owner = 'transition {}'.format(transition)
+            codes.append(('guard of ' + owner, getattr(transition, 'guard', None), 'eval'))
+            codes.append(('action of ' + owner, getattr(transition, 'action', None), 'exec'))
+            codes.extend(self.__contract_codes(owner, transition))
+
+        errors = []
+        for location, code, mode in codes:
+            if not code:
+                continue
+            try:
+                self._compile(code, mode)
+            except SyntaxError as e:
+                errors.append('{}: {}\n{}'.format(location, e.msg, code))
+
+        if len(errors) > 0:
+            raise CodeEvaluationError('{} piece(s) of code cannot be compiled in statechart {}:\n\n{}'.format(
+                len(errors), statechart.name, '\n\n'.join(errors)))
+
+    @staticmethod
+    def __contract_codes(owner: str, obj) -> Iterator[Tuple[str, str, str]]:
+        """
+        Return the contract conditions of given state or transition.
+
+        :param owner: description of the state or transition
+        :param obj: a state or a transition
+        :return: triples (location, code, compilation mode)
+        """
+        for kind in ['precondition', 'postcondition', 'invariant']:
+            for condition in getattr(obj, kind + 's', []):
+                yield ('{} of {}'.format(kind, owner), condition, 'eval')
+
     def execute_statechart(self, statechart: Statechart) -> None:
         """
         Execute the initial code of a statechart.
         This method is called at the very beginning of the execution.
+        Every piece of code of the statechart is compiled beforehand (see *precompile*), the first
+        time this method is called for this statechart.
 
         :param statechart: statechart to consider
+        :raise CodeEvaluationError: if some code cannot be compiled
         """
+        if statechart not in PythonEvaluator._precompiled_statecharts:
+            self.precompile(statechart)
+            PythonEvaluator._precompiled_statecharts.add(statechart)
         if statechart.preamble:
             self._execute_code(statechart.preamble,
                                context=self._context)
 
+    def __scope_for(self, name: str) -> '_TransitionScope':
+        """
+        Return the pre-allocated scope that is used for the guards and the actions of the
+        transitions of given state. The scope is created the first time it is needed.
+
+        :param name: State name
+        :return: a *_TransitionScope* instance
+        """
+        scope = self.__scopes.get(name, None)
+        if scope is None:
+            scope = self.__scopes.setdefault(name, _TransitionScope(
+                self.context_for(name).new_child(),
+                {
+                    'active': self.__active,
+                    'after': partial(self.__after, name),
+                    'idle': partial(self.__idle, name),
+                },
+                {
+                    'active': self.__active,
+                    'send': self.__send,
+                }
+            ))
+        return scope
+
     def evaluate_guard(self, transition: Transition, event: Event) -> bool:
         """
         Evaluate the guard for given transition.
@@ -293,14 +828,21 @@ class PythonEvaluator(Evaluator):
         :param event: instance of *Event* if any
         :return: truth value of *code*
         """
-        additional_context = {
-            'event': event,
-            'after': partial(self.__after, transition.source),
-            'idle': partial(self.__idle, transition.source),
-        }
-        return self._evaluate_code(getattr(transition, 'guard', None),
-                                   context=self.__contexts[transition.source].new_child(),
-                                   additional_context=additional_context)
+        code = getattr(transition, 'guard', None)
+        if not code:
+            return True
+
+        scope = self.__scope_for(transition.source)
+        exposed_context = scope.guard_globals
+        exposed_context['time'] = self._interpreter.time
+        exposed_context['event'] = event
+        if scope.context.map:
+            scope.context.map.clear()
+
+        try:
+            return eval(self._compile(code, 'eval'), exposed_context, scope.context)  # type: ignore
+        except Exception as e:
+            raise CodeEvaluationError('The above exception occurred while evaluating:\n{}'.format(code)) from e
 
     def execute_action(self, transition: Transition, event: Event) -> None:
         """
@@ -312,9 +854,21 @@ class PythonEvaluator(Evaluator):
         """
         self.__idle_time[transition.source] = self._interpreter.time
 
-        self._execute_code(getattr(transition, 'action', None),
-                           context=self.__contexts[transition.source].new_child(),
-                           additional_context={'event': event})
+        code = getattr(transition, 'action', None)
+        if not code:
+            return
+
+        scope = self.__scope_for(transition.source)
+        exposed_context = dict(scope.action_globals)
+        exposed_context['time'] = self._interpreter.time
+        exposed_context['event'] = event
+        if scope.context.map:
+            scope.context.map.clear()
+
+        try:
+            exec(self._compile(code, 'exec'), exposed_context, scope.context)  # type: ignore
+        except Exception as e:
+            raise CodeEvaluationError('The above exception occurred while executing:\n{}'.format(code)) from e
 
     def execute_onentry(self, state: StateMixin) -> None:
         """
@@ -325,9 +879,11 @@ class PythonEvaluator(Evaluator):
         """
         self.__entry_time[state.name] = self._interpreter.time
         self.__idle_time[state.name] = self._interpreter.time
+        self.__configuration_version += 1
+        self.__invariant_stamps.pop(state.name, None)
 
         self._execute_code(getattr(state, 'on_entry', None),
-                           context=self.__contexts[state.name])
+                           context=self.context_for(state.name))
 
     def execute_onexit(self, state: StateMixin) -> None:
         """
@@ -336,8 +892,21 @@ class PythonEvaluator(Evaluator):
 
         :param state: the considered state
         """
+        self.__configuration_version += 1
+
         self._execute_code(getattr(state, 'on_exit', None),
-                           context=self.__contexts[state.name])
+                           context=self.context_for(state.name))
+
+    @staticmethod
+    def __memory_key(obj) -> Any:
+        """
+        Key used to store the values exposed through *__old__* for given state or transition.
+        States are identified by their name, so that these values can be part of a snapshot.
+
+        :param obj: a state or a transition
+        :return: a key for *__memory*
+        """
+        return id(obj) if isinstance(obj, Transition) else obj.name
 
     def evaluate_preconditions(self, obj, event: Event=None) -> Iterator[str]:
         """
@@ -349,13 +918,14 @@ class PythonEvaluator(Evaluator):
         :return: list of unsatisfied conditions
         """
         state_name = obj.source if isinstance(obj, Transition) else obj.name
-        context = self.__contexts[state_name]
+        context = self.context_for(state_name)
 
         additional_context = {'event': event} if isinstance(obj, Transition) else {}
 
-        # Only needed if there is an invariant or a postcondition
-        if len(getattr(obj, 'invariants', [])) > 0 or len(getattr(obj, 'postconditions', [])) > 0:
-            self.__memory[id(obj)] = FrozenContext(context)
+        # Only needed if there is an invariant or a postcondition, and only for the names used through __old__
+        conditions = tuple(getattr(obj, 'invariants', [])) + tuple(getattr(obj, 'postconditions', []))
+        if len(conditions) > 0:
+            self.__memory[self.__memory_key(obj)] = FrozenContext(context, _old_names(conditions))
 
         return filter(
             lambda c: not self._evaluate_code(c, context=context, additional_context=additional_context),
@@ -372,16 +942,52 @@ class PythonEvaluator(Evaluator):
         :return: list of unsatisfied conditions
         """
         state_name = obj.source if isinstance(obj, Transition) else obj.name
-        context = self.__contexts[state_name]
+        context = self.context_for(state_name)
 
         additional_context = {'event': event} if isinstance(obj, Transition) else {}  # type: Dict[str, Any]
-        additional_context.update({'__old__': self.__memory.get(id(obj), None)})
+        additional_context.update({'__old__': self.__memory.get(self.__memory_key(obj), None)})
+
+        if self.skip_unchanged_invariants and not isinstance(obj, Transition):
+            return self.__evaluate_state_invariants(obj, context, additional_context)
 
         return filter(
             lambda c: not self._evaluate_code(c, context=context, additional_context=additional_context),
             getattr(obj, 'invariants', [])
         )
 
+    def __evaluate_state_invariants(self, state: StateMixin, context: Context,
+                                    additional_context: Mapping) -> Iterator[str]:
+        """
+        Evaluate the invariants of given state and yield the ones that are not satisfied.
+        Invariants are skipped if their value cannot have changed since their last successful evaluation
+        (see *skip_unchanged_invariants*).
+
+        :param state: the considered state
+        :param context: the context of the state
+        :param additional_context: additional values to expose
+        :return: unsatisfied conditions
+        """
+        journal = cast(_WriteJournal, self._context._journal)
+        stamps = self.__invariant_stamps.setdefault(state.name, {})
+        for condition in getattr(state, 'invariants', []):
+            dependencies = _invariant_dependencies(condition)
+            last = stamps.get(condition, None)
+
+            if dependencies is not None and last is not None:
+                names, uses_active = dependencies
+                stamp, version = last
+                if (not uses_active or version == self.__configuration_version) and \
+                        all(journal.stamps.get(name, 0) <= stamp for name in names):
+                    self.skipped_invariants += 1
+                    continue
+
+            self.evaluated_invariants += 1
+            stamps.pop(condition, None)
+            if self._evaluate_code(condition, context=context, additional_context=additional_context):
+                stamps[condition] = (journal.counter, self.__configuration_version)
+            else:
+                yield condition
+
     def evaluate_postconditions(self, obj, event: Event=None) -> Iterator[str]:
         """
         Evaluate the postconditions for given object (either a *StateMixin* or a
@@ -392,10 +998,10 @@ class PythonEvaluator(Evaluator):
         :return: list of unsatisfied conditions
         """
         state_name = obj.source if isinstance(obj, Transition) else obj.name
-        context = self.__contexts[state_name]
+        context = self.context_for(state_name)
 
         additional_context = {'event': event} if isinstance(obj, Transition) else {}  # type: Dict[str, Any]
-        additional_context.update({'__old__': self.__memory.get(id(obj), None)})
+        additional_context.update({'__old__': self.__memory.get(self.__memory_key(obj), None)})
 
         return filter(
             lambda c: not self._evaluate_code(c, context=context, additional_context=additional_context),
@@ -1,3 +1,6 @@
+import pickle
+
+
 class SismicError(Exception):
     pass
 
@@ -77,6 +80,14 @@ class ContractError(SismicError):
     def context(self):
         return self._context
 
+    def __reduce__(self):
+        # The context is pickled as a dict, without the values that cannot be pickled (eg. classes
+        # defined by a preamble), so that contract errors can be sent between processes.
+        context = None
+        if self._context is not None:
+            context = {key: value for key, value in self._context.items() if _is_picklable(value)}
+        return self.__class__, (self._configuration, self._step, self._obj, self._assertion, context)
+
     def __str__(self):  # pragma: no cover
         message = ['{}'.format(self.__class__.__name__.replace('Failed', ''))]
         if self._obj:
@@ -113,4 +124,15 @@ class InvariantError(ContractError):
     """
     An invariant is not satisfied.
     """
-    pass
\ No newline at end of file
+    pass
+
+
+def _is_picklable(value) -> bool:
+    """
+    Return True if given value can be pickled.
+    """
+    try:
+        pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+    except Exception:
+        return False
+    return True
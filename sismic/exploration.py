@@ -0,0 +1,473 @@
+import hashlib
+import pickle
+import random
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Mapping, Optional, Sequence, Set, Tuple, Union
+
+from sismic.code import PythonEvaluator
+from sismic.exceptions import ContractError
+from sismic.interpreter import Interpreter
+from sismic.model import Event, MacroStep, Statechart, Transition
+from sismic.stories import Pause, Story, _load_statechart
+
+__all__ = ['ExplorationReport', 'explore', 'fingerprint', 'StoryFuzzer']
+
+
+class ExplorationReport:
+    """
+    The result of an exploration of the reachable situations of an interpreter (see *explore*).
+
+    A situation is identified by a fingerprint (see *fingerprint*). The states and the transitions that are
+    reported as unreachable (resp. unprocessed) are the ones that were not reached (resp. processed) during
+    the exploration, which depends on the given items and on the limits of the exploration.
+
+    :param statechart: the statechart that was explored
+    """
+    def __init__(self, statechart: Statechart) -> None:
+        self.statechart = statechart
+
+        self.situations = 0  # Number of distinct situations that were reached
+        self.executions = 0  # Number of items that were told
+        self.depth = 0  # Length of the longest story that led to a new situation
+        self.complete = True  # False if some situations were not explored due to the limits
+
+        self.visited_states = set()  # type: Set[str]
+        self.processed_transitions = set()  # type: Set[Transition]
+        self.violations = []  # type: List[Tuple[Story, ContractError]]
+
+    @property
+    def unreachable_states(self) -> List[str]:
+        """
+        Names of the states that were never entered nor active, in lexicographic order.
+        """
+        return [name for name in self.statechart.states if name not in self.visited_states]
+
+    @property
+    def unprocessed_transitions(self) -> List[Transition]:
+        """
+        Transitions that were never processed.
+        """
+        return [t for t in self.statechart.transitions if t not in self.processed_transitions]
+
+    def _record(self, steps: Iterable[MacroStep]) -> None:
+        for step in steps:
+            self.visited_states.update(step.entered_states)
+            self.processed_transitions.update(step.transitions)
+
+    def __repr__(self):
+        return '{}(situations={}, executions={}, depth={}, complete={}, violations={})'.format(
+            self.__class__.__name__, self.situations, self.executions, self.depth, self.complete,
+            len(self.violations))
+
+
+def fingerprint(interpreter: Interpreter) -> Hashable:
+    """
+    Default fingerprint of the situation of an interpreter, used by *explore* to detect situations that were
+    already visited.
+
+    The fingerprint is made of the active configuration, the memory of the history states, a hash of the
+    variables of the interpreter and the time remaining until its next deadline (see *Interpreter.next_deadline*).
+    For a *PythonEvaluator*, the variables of the context of every state (and the values recorded for *__old__*)
+    are hashed, otherwise only the variables of the context of the interpreter are. Values are hashed using
+    their *pickle* representation or, if they cannot be pickled, their *repr*.
+
+    :param interpreter: an interpreter
+    :return: a hashable value
+    """
+    evaluator = interpreter._evaluator
+    if isinstance(evaluator, PythonEvaluator):
+        state = evaluator.snapshot()
+        maps = chain(
+            [(('context', ), state['context'])],
+            sorted((('contexts', name), values) for name, values in state['contexts'].items()),
+            sorted((('memory', name), values) for name, values in state['memory'].items()),
+        )  # type: Iterable[Tuple[Tuple[str, ...], Mapping[str, Any]]]
+    else:
+        maps = iter([(('context', ), interpreter.context)])
+
+    context_hash = hashlib.sha1()
+    for key, values in maps:
+        if len(values) == 0:
+            continue  # Nested contexts are created on demand
+        context_hash.update(pickle.dumps(key))
+        for name, value in sorted(values.items(), key=lambda item: item[0]):
+            try:
+                data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            except Exception:
+                data = repr(value).encode()
+            context_hash.update(pickle.dumps(name))
+            context_hash.update(data)
+
+    deadline = interpreter.next_deadline()
+    return (
+        frozenset(interpreter.configuration),
+        tuple(sorted((name, None if memory is None else tuple(memory))
+                     for name, memory in interpreter._memory.items())),
+        context_hash.hexdigest(),
+        None if deadline is None else deadline - interpreter.time,
+    )
+
+
+def explore(interpreter: Interpreter, items: Sequence[Union[Event, Pause]], *,
+            strategy: str='bfs', max_depth: int=None, max_situations: int=None,
+            fingerprint: Callable[[Interpreter], Hashable]=fingerprint, workers: int=None) -> ExplorationReport:
+    """
+    Explore the situations that can be reached from the current situation of given interpreter, by telling
+    it every sequence of *items* (events and pauses). The interpreter itself is not modified, as the exploration
+    relies on its forks (see *Interpreter.fork*).
+
+    The situations that were already visited (according to their fingerprint) are not explored again. Pauses are
+    told in fast-forward mode (see *Story.tell*), so that time-based transitions are processed at their exact time.
+    If a contract is not satisfied, the story that led to it and the exception are stored in the *violations*
+    attribute of the report, and the corresponding situation is not explored further.
+
+    If *workers* is set, the situations of each depth are explored in parallel by that many processes.
+    The exploration is then breadth-first, and relies on snapshots (see *Interpreter.snapshot*) of the
+    interpreters. The statechart, the evaluator class of the interpreter, the items and the fingerprint
+    function should be picklable. Contract policies are not taken into account by the worker processes.
+
+    :param interpreter: the interpreter whose situation is the starting point of the exploration
+    :param items: events and pauses that can be told to the interpreter
+    :param strategy: either 'bfs' (breadth-first) or 'dfs' (depth-first)
+    :param max_depth: maximal length of the stories, or None for no limit
+    :param max_situations: maximal number of situations to visit, or None for no limit
+    :param fingerprint: a callable that takes an interpreter and returns a hashable value that identifies
+        its situation (see *fingerprint*)
+    :param workers: number of processes to use, or None to explore in the current process
+    :return: an *ExplorationReport* instance
+    :raise ValueError: if the strategy is not supported
+    """
+    if strategy not in ('bfs', 'dfs'):
+        raise ValueError('Unknown strategy: {}'.format(strategy))
+    if workers is not None and strategy != 'bfs':
+        raise ValueError('Workers can only be used with a breadth-first strategy')
+
+    report = ExplorationReport(interpreter.statechart)
+
+    root = interpreter.fork()
+    report.visited_states.update(root.configuration)
+    report._record(root.execute())
+
+    visited = {fingerprint(root): 0}  # type: Dict[Hashable, int]  # Fingerprint -> shortest depth
+    report.situations = 1
+
+    if workers is None:
+        _explore(root, items, strategy, max_depth, max_situations, fingerprint, report, visited)
+    else:
+        _explore_in_processes(root, items, max_depth, max_situations, fingerprint, workers, report, visited)
+    return report
+
+
+def _explore(root: Interpreter, items: Sequence[Union[Event, Pause]], strategy: str, max_depth: Optional[int],
+             max_situations: Optional[int], fingerprint: Callable[[Interpreter], Hashable],
+             report: ExplorationReport, visited: Dict[Hashable, int]) -> None:
+    """
+    Explore the situations that can be reached from *root* in the current process, and update *report*.
+    See *explore* for the parameters.
+    """
+    frontier = deque([(root, Story())])
+    while len(frontier) > 0:
+        node, story = frontier.popleft() if strategy == 'bfs' else frontier.pop()
+        if max_depth is not None and len(story) >= max_depth:
+            report.complete = False
+            continue
+
+        children = []
+        for i, item in enumerate(items):
+            # The last child reuses the interpreter of the node, as it is no longer needed
+            child = node if i == len(items) - 1 else node.fork()
+            child_story = Story(story + [item])
+            report.executions += 1
+            try:
+                report._record(Story([item]).tell(child, fast_forward=True))
+            except ContractError as e:
+                report.violations.append((child_story, e))
+                continue
+
+            # A situation is explored again if it is reached by a shorter story (only for depth-first)
+            key = fingerprint(child)
+            depth = visited.get(key, None)
+            if depth is not None and depth <= len(child_story):
+                continue
+            if depth is None:
+                if max_situations is not None and report.situations >= max_situations:
+                    report.complete = False
+                    return
+                report.situations += 1
+            visited[key] = len(child_story)
+            report.depth = max(report.depth, len(child_story))
+            children.append((child, child_story))
+
+        # Children are explored in the order of the items, whatever the strategy
+        frontier.extend(children if strategy == 'bfs' else reversed(children))
+
+
+def _expand(statechart_data: bytes, evaluator_klass: Callable, ignore_contract: bool,
+            items: Sequence[Union[Event, Pause]], fingerprint: Callable[[Interpreter], Hashable],
+            nodes: List[Tuple[bytes, Story]]) -> List[Tuple[Story, Any, Optional[bytes], Set[str], Set[int]]]:
+    """
+    Tell every item to (a fork of) the interpreters that are described by given snapshots.
+    This function is executed by worker processes, see *explore*.
+
+    :return: for each child, its story, its fingerprint, its snapshot (or None if a contract was not satisfied),
+        the names of the entered states and the indexes of the processed transitions.
+    """
+    statechart = _load_statechart(statechart_data)
+    transition_indexes = {id(t): i for i, t in enumerate(statechart.transitions)}
+
+    template = Interpreter(statechart, evaluator_klass=evaluator_klass, ignore_contract=ignore_contract)
+    results = []
+    for snapshot, story in nodes:
+        node = template.fork().restore(snapshot)
+        for i, item in enumerate(items):
+            child = node if i == len(items) - 1 else node.fork()
+            child_story = Story(story + [item])
+            try:
+                steps = Story([item]).tell(child, fast_forward=True)
+            except ContractError:
+                results.append((child_story, None, None, set(), set()))
+                continue
+
+            entered = {name for step in steps for name in step.entered_states}
+            processed = {transition_indexes[id(t)] for step in steps for t in step.transitions}
+            results.append((child_story, fingerprint(child), child.snapshot(), entered, processed))
+    return results
+
+
+def _explore_in_processes(root: Interpreter, items: Sequence[Union[Event, Pause]], max_depth: Optional[int],
+                          max_situations: Optional[int], fingerprint: Callable[[Interpreter], Hashable],
+                          workers: int, report: ExplorationReport, visited: Dict[Hashable, int]) -> None:
+    """
+    Explore the situations that can be reached from *root*, one depth at a time, using *workers* processes.
+    See *explore* for the parameters.
+    """
+    statechart_data = pickle.dumps(root.statechart, protocol=pickle.HIGHEST_PROTOCOL)
+    transitions = root.statechart.transitions
+    items = list(items)
+
+    level = [(root.snapshot(), Story())]
+    with ProcessPoolExecutor(workers) as executor:
+        while len(level) > 0:
+            if max_depth is not None and len(level[0][1]) >= max_depth:
+                report.complete = False
+                return
+
+            # Several chunks per worker, to balance the load
+            size = max(1, len(level) // (workers * 4))
+            futures = [
+                executor.submit(_expand, statechart_data, root._evaluator_klass, root._ignore_contract,
+                                items, fingerprint, level[i:i + size])
+                for i in range(0, len(level), size)
+            ]
+
+            level = []
+            for future in futures:
+                for child_story, key, snapshot, entered, processed in future.result():
+                    report.executions += 1
+                    report.visited_states.update(entered)
+                    report.processed_transitions.update(transitions[i] for i in processed)
+
+                    if snapshot is None:
+                        report.violations.append((child_story, _violation_for(root, child_story)))
+                        continue
+                    if key in visited:
+                        continue
+                    if max_situations is not None and report.situations >= max_situations:
+                        report.complete = False
+                        return
+
+                    report.situations += 1
+                    visited[key] = len(child_story)
+                    report.depth = max(report.depth, len(child_story))
+                    level.append((snapshot, child_story))
+
+
+def _violation_for(root: Interpreter, story: Story) -> Optional[ContractError]:
+    """
+    Tell given story to a fork of *root*, and return the contract error that is raised.
+    This is used to obtain the exceptions for the violations that were detected by worker processes.
+    """
+    try:
+        story.tell(root.fork(), fast_forward=True)
+    except ContractError as e:
+        return e
+    return None
+
+
+class StoryFuzzer:
+    """
+    A coverage-guided generator of stories.
+
+    The fuzzer maintains a corpus of stories. Each run picks a story in the corpus, mutates it (by inserting,
+    deleting, replacing or swapping some of its events and pauses) and tells the resulting story to a fork of
+    the given interpreter (see *Interpreter.fork*). The states that are entered and the transitions that are
+    processed during this execution are recorded in a coverage bitmap. The story is added to the corpus if it
+    covers a state or a transition that was not covered yet. If a contract is not satisfied, the story (up to
+    the item that led to the failure) and the exception are stored in *failures*, provided that no failure
+    of the same condition for the same state or transition was already found.
+
+    Pauses are told in fast-forward mode (see *Story.tell*), so that time-based transitions are processed at
+    their exact time.
+
+    :param interpreter: the interpreter whose situation is the starting point of every story
+        (the interpreter itself is not modified)
+    :param items: events and pauses that can be inserted in the stories
+    :param corpus: optional initial stories (by default, only the empty story)
+    :param max_length: maximal length of the mutated stories
+    :param seed: optional seed for the random number generator
+    """
+    def __init__(self, interpreter: Interpreter, items: Sequence[Union[Event, Pause]], *,
+                 corpus: Iterable[Story]=None, max_length: int=20, seed: Any=None) -> None:
+        self.items = list(items)
+        self.max_length = max_length
+        self.statechart = interpreter.statechart
+
+        self.corpus = []  # type: List[Story]
+        self.failures = []  # type: List[Tuple[Story, ContractError]]
+        self.executions = 0
+        self.coverage = 0  # Bitmap of the covered states and transitions, see coverage_for
+
+        self._random = random.Random(seed)
+        self._pending = [Story()] if corpus is None else [Story(story) for story in corpus]
+        self._failure_keys = set()  # type: Set[Tuple[Any, ...]]
+
+        # Bits of the coverage bitmap
+        states = self.statechart.states
+        self._state_bits = {name: 1 << i for i, name in enumerate(states)}
+        self._transition_bits = {id(t): 1 << (len(states) + i) for i, t in enumerate(self.statechart.transitions)}
+
+        # Every story is told to a fork of this interpreter
+        self._template = interpreter.fork()
+        self._template_coverage = self.coverage_for(self._template.execute())
+        for name in self._template.configuration:
+            self._template_coverage |= self._state_bits[name]
+        self.coverage = self._template_coverage
+
+    @property
+    def visited_states(self) -> List[str]:
+        """
+        Names of the states that were entered or active, in lexicographic order.
+        """
+        return [name for name in self.statechart.states if self.coverage & self._state_bits[name]]
+
+    @property
+    def processed_transitions(self) -> List[Transition]:
+        """
+        Transitions that were processed.
+        """
+        return [t for t in self.statechart.transitions if self.coverage & self._transition_bits[id(t)]]
+
+    @property
+    def unreachable_states(self) -> List[str]:
+        """
+        Names of the states that were never entered nor active, in lexicographic order.
+        """
+        return [name for name in self.statechart.states if not self.coverage & self._state_bits[name]]
+
+    @property
+    def unprocessed_transitions(self) -> List[Transition]:
+        """
+        Transitions that were never processed.
+        """
+        return [t for t in self.statechart.transitions if not self.coverage & self._transition_bits[id(t)]]
+
+    def coverage_for(self, steps: Iterable[MacroStep]) -> int:
+        """
+        Return the coverage bitmap of given steps.
+
+        :param steps: a list of *MacroStep* instances
+        :return: a bitmap, as an integer
+        """
+        coverage = 0
+        for step in steps:
+            for name in step.entered_states:
+                coverage |= self._state_bits[name]
+            for transition in step.transitions:
+                coverage |= self._transition_bits[id(transition)]
+        return coverage
+
+    def mutate(self, story: Story) -> Story:
+        """
+        Return a mutation of given story. One or two mutations, amongst inserting, deleting or replacing an item
+        and swapping two items, are applied.
+
+        :param story: a story
+        :return: a new story
+        """
+        story = Story(story)
+        for _ in range(self._random.randint(1, 2)):
+            mutations = []
+            if len(story) < self.max_length and len(self.items) > 0:
+                mutations.append(self.__insert)
+            if len(story) > 0:
+                mutations.append(self.__delete)
+                mutations.append(self.__replace)
+            if len(story) > 1:
+                mutations.append(self.__swap)
+            if len(mutations) > 0:
+                self._random.choice(mutations)(story)
+        return story
+
+    def __insert(self, story: Story) -> None:
+        story.insert(self._random.randint(0, len(story)), self._random.choice(self.items))
+
+    def __delete(self, story: Story) -> None:
+        del story[self._random.randrange(len(story))]
+
+    def __replace(self, story: Story) -> None:
+        story[self._random.randrange(len(story))] = self._random.choice(self.items)
+
+    def __swap(self, story: Story) -> None:
+        i, j = self._random.sample(range(len(story)), 2)
+        story[i], story[j] = story[j], story[i]
+
+    def execute(self, story: Story) -> bool:
+        """
+        Tell given story to a fork of the interpreter, and update the corpus, the coverage and the failures.
+
+        :param story: a story
+        :return: True if the story covered a new state or transition, or led to a new failure
+        """
+        self.executions += 1
+        interpreter = self._template.fork()
+        coverage = self._template_coverage
+        told = 0
+        try:
+            for _, steps in story.tell_by_step(interpreter, fast_forward=True):
+                coverage |= self.coverage_for(steps)
+                told += 1
+        except ContractError as e:
+            key = (e.__class__, repr(e.obj), e.condition)
+            if key in self._failure_keys:
+                return False
+            self._failure_keys.add(key)
+            self.failures.append((Story(story[:told + 1]), e))
+            return True
+
+        if coverage & ~self.coverage:
+            self.coverage |= coverage
+            self.corpus.append(story)
+            return True
+        return False
+
+    def run(self, executions: int) -> 'StoryFuzzer':
+        """
+        Tell *executions* stories. The initial stories are told first (and are kept in the corpus under the
+        same conditions as the other stories), and then mutations of the stories in the corpus are told.
+
+        :param executions: number of stories to tell
+        :return: *self* so it can be chained
+        """
+        for _ in range(executions):
+            if len(self._pending) > 0:
+                story = self._pending.pop(0)
+            else:
+                story = self.mutate(self._random.choice(self.corpus) if len(self.corpus) > 0 else Story())
+            self.execute(story)
+        return self
+
+    def __repr__(self):
+        return '{}(executions={}, corpus={}, failures={})'.format(
+            self.__class__.__name__, self.executions, len(self.corpus), len(self.failures))
@@ -1,15 +1,105 @@
+import copy
+import pickle
+import random
 import threading
 from itertools import combinations
 
 from collections import deque
 from functools import wraps
+from time import perf_counter
 from sismic import model
 from sismic.code import Evaluator, PythonEvaluator
-from sismic.exceptions import InvariantError, PreconditionError, PostconditionError
+from sismic.exceptions import ExecutionError, InvariantError, PreconditionError, PostconditionError, StatechartError
 from sismic.exceptions import NonDeterminismError, ConflictingTransitionsError
-from typing import Optional, List, Union, Callable, Any, cast, Iterable, Mapping
+from typing import Optional, List, Union, Callable, Any, cast, Dict, Iterable, Iterator, Mapping
 
-__all__ = ['Interpreter', 'log_trace', 'run_in_background']
+__all__ = ['Interpreter', 'ContractPolicy', 'BatchInterpreter', 'log_trace', 'run_in_background', 'run_in_asyncio']
+
+
+class ContractPolicy:
+    """
+    A policy that determines which contract conditions are checked by an interpreter
+    (see the *contract_policy* parameter of *Interpreter*). By default, every condition is checked.
+
+    The decision to check the preconditions, the postconditions or the invariants of a state or a transition is
+    made each time they are about to be checked. When preconditions are skipped, the evaluator still records the
+    values that are exposed to postconditions and invariants (eg. *__old__* for a *PythonEvaluator*), so that
+    these conditions can be checked later on.
+
+    A policy keeps track of the macro steps and of the time spent to check conditions,
+    and should therefore not be shared by several interpreters.
+
+    :param sample_rate: probability (between 0 and 1) for the conditions of a state or a transition
+        to be checked, each time a check is considered.
+    :param every: conditions are only checked during one macro step out of *every* macro steps.
+    :param time_budget: maximal time (in seconds) spent to check conditions during a macro step.
+        Once it is exceeded, the remaining checks of the macro step are skipped.
+    :param states: if provided, only the conditions of the states whose name is in *states*
+        are checked.
+    :param transitions: if provided, only the conditions of these transitions are checked.
+    :param seed: optional seed for the random number generator that is used for sampling.
+    """
+
+    def __init__(self, *, sample_rate: float=1.0, every: int=1, time_budget: float=None,
+                 states: Iterable[str]=None, transitions: Iterable[model.Transition]=None,
+                 seed: Any=None) -> None:
+        self.sample_rate = sample_rate
+        self.every = every
+        self.time_budget = time_budget
+        self.states = None if states is None else frozenset(states)
+        self.transitions = None if transitions is None else list(transitions)
+
+        self._transition_ids = None if transitions is None else {id(t) for t in self.transitions}
+        self._random = random.Random(seed)
+        self._steps = 0  # Number of started macro steps
+        self._spent = 0.0  # Time spent during current macro step
+
+        self.checked = 0  # Number of allowed checks
+        self.skipped = 0  # Number of skipped checks
+
+    def start_step(self) -> None:
+        """
+        Notify the policy that a new macro step is started.
+        """
+        self._steps += 1
+        self._spent = 0.0
+
+    def spend(self, duration: float) -> None:
+        """
+        Notify the policy that some time was spent to check conditions.
+
+        :param duration: time (in seconds)
+        """
+        self._spent += duration
+
+    def allows(self, obj: Union[model.Transition, model.StateMixin]) -> bool:
+        """
+        Return True if the conditions of given state or transition can be checked now.
+
+        :param obj: a state or a transition
+        :return: True if the conditions can be checked
+        """
+        if isinstance(obj, model.Transition):
+            allowed = self._transition_ids is None or id(obj) in self._transition_ids
+        else:
+            allowed = self.states is None or obj.name in self.states
+
+        allowed = (
+            allowed and
+            (self._steps - 1) % self.every == 0 and
+            (self.time_budget is None or self._spent < self.time_budget) and
+            (self.sample_rate >= 1 or self._random.random() < self.sample_rate)
+        )
+
+        if allowed:
+            self.checked += 1
+        else:
+            self.skipped += 1
+        return allowed
+
+    def __repr__(self):
+        return '{}(sample_rate={}, every={}, time_budget={})'.format(
+            self.__class__.__name__, self.sample_rate, self.every, self.time_budget)
 
 
 class Interpreter:
@@ -23,20 +113,25 @@ class Interpreter:
     :param initial_context: an optional initial context that will be provided to the evaluator.
         By default, an empty context is provided
     :param ignore_contract: set to True to ignore contract checking during the execution.
+    :param contract_policy: an optional *ContractPolicy* instance that determines which contract conditions are
+        checked during the execution. By default, all of them are checked (unless *ignore_contract* is set).
     """
 
     def __init__(self, statechart: model.Statechart, *,
                  evaluator_klass: Callable[['Interpreter'], Evaluator]=PythonEvaluator,
                  initial_context: Mapping=None,
-                 ignore_contract: bool=False) -> None:
+                 ignore_contract: bool=False,
+                 contract_policy: ContractPolicy=None) -> None:
         # Internal variables
         self._ignore_contract = ignore_contract
+        self._contract_policy = contract_policy
         self._statechart = statechart
+        self._evaluator_klass = evaluator_klass  # See fork
 
         self._initialized = False
         self._time = 0  # type: float  # Internal clock
         self._memory = {}  # type: Dict[str, Optional[List[str]]]  # History states memory
-        self._configuration = set()  # type: Set[str]  # Set of active states
+        self._configuration = model.Configuration(statechart)  # Set of active states
         self._external_events = deque()  # type: deque[model.Event]  # External events queue
         self._internal_events = deque()  # type: deque[model.InternalEvent]  # Internal events queue
         self._bound = []  # type: List[Callable[[model.Event], Any]]
@@ -67,7 +162,21 @@ class Interpreter:
         List of active states names, ordered by depth. Ties are broken according to the lexicographic order
         on the state name.
         """
-        return sorted(self._configuration, key=lambda s: (self._statechart.depth_for(s), s))
+        return list(self._configuration.ordered)
+
+    def next_deadline(self) -> Optional[float]:
+        """
+        Return the earliest time (greater than the current time) at which a time-based guard that
+        was evaluated during the last executions could be satisfied, or None if there is no such time.
+        This is useful to avoid calling *execute* until this time is reached, if no event is queued.
+
+        Notice that the evaluator determines the deadlines while evaluating guards. Moreover, a guard that does
+        not only depend on time-based predicates (eg. *after* or *idle* for a *PythonEvaluator*) could also be
+        satisfied because the context was externally changed.
+
+        :return: a time value or None
+        """
+        return self._evaluator.next_deadline()
 
     @property
     def context(self) -> Mapping[str, Any]:
@@ -129,29 +238,136 @@ class Interpreter:
             raise ValueError('{} is not an Event instance'.format(event))
         return self
 
+    def snapshot(self) -> bytes:
+        """
+        Return a snapshot of the runtime state of this interpreter, to be restored later on
+        (possibly in another process) using *restore*.
+
+        The snapshot contains the internal clock, the active configuration, the memory of history states,
+        the queued events and the runtime state of the evaluator (see *Evaluator.snapshot*).
+        The statechart, the bound callables and the contract policy are not part of the snapshot.
+        The snapshot is created using *pickle*, so the queued events and the values of the context
+        must be picklable.
+
+        :return: a snapshot, as bytes
+        :raise NotImplementedError: if the evaluator does not support snapshots
+        """
+        state = {
+            'statechart': self._statechart.name,
+            'initialized': self._initialized,
+            'time': self._time,
+            'configuration': list(self._configuration),
+            'memory': dict(self._memory),
+            'external_events': list(self._external_events),
+            'internal_events': list(self._internal_events),
+            'evaluator': self._evaluator.snapshot(),
+        }
+        return pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def restore(self, snapshot: bytes) -> 'Interpreter':
+        """
+        Restore a snapshot that was created by *snapshot*, possibly by another interpreter of the same statechart.
+        The runtime state of this interpreter (and of its evaluator) is replaced by the one of the snapshot,
+        and the execution can be resumed from there. No code of the statechart is executed.
+
+        As a snapshot is loaded using *pickle*, it should never be restored from an untrusted source.
+
+        :param snapshot: a snapshot, as returned by *snapshot*
+        :return: *self* so it can be chained
+        :raise ExecutionError: if the snapshot was created for another statechart
+        """
+        state = pickle.loads(snapshot)
+
+        if state['statechart'] != self._statechart.name:
+            raise ExecutionError('Snapshot of statechart {} cannot be restored for statechart {}'.format(
+                state['statechart'], self._statechart.name))
+        try:
+            configuration = model.Configuration(self._statechart, state['configuration'])
+            for name in state['memory']:
+                self._statechart.state_for(name)
+        except StatechartError as e:
+            raise ExecutionError('Snapshot cannot be restored for statechart {}: {}'.format(
+                self._statechart.name, e)) from e
+
+        self._initialized = state['initialized']
+        self._time = state['time']
+        self._configuration = configuration
+        self._memory = dict(state['memory'])
+        self._external_events = deque(state['external_events'])
+        self._internal_events = deque(state['internal_events'])
+        self._evaluator.restore(state['evaluator'])
+        return self
+
+    def fork(self) -> 'Interpreter':
+        """
+        Return a new interpreter whose runtime state is a copy of the one of this interpreter, so that both
+        interpreters can be executed independently from this point (eg. to explore alternative sequences of events).
+
+        The statechart and the compiled code are shared, and no code of the statechart is executed.
+        The runtime state of the evaluator (see *Evaluator.snapshot*) is deeply copied.
+        The contract policy (if any) is copied as well. Bound callables are not part of the new interpreter,
+        and neither are the methods that were replaced on this instance (eg. by *log_trace*).
+
+        :return: a new *Interpreter* instance
+        :raise NotImplementedError: if the evaluator does not support snapshots
+        """
+        clone = self.__class__.__new__(self.__class__)
+
+        clone._ignore_contract = self._ignore_contract
+        clone._contract_policy = copy.copy(self._contract_policy)
+        if clone._contract_policy is not None:
+            clone._contract_policy._random = copy.copy(self._contract_policy._random)
+        clone._statechart = self._statechart
+        clone._evaluator_klass = self._evaluator_klass
+
+        clone._initialized = self._initialized
+        clone._time = self._time
+        clone._memory = dict(self._memory)  # Lists are replaced rather than modified
+        clone._configuration = self._configuration.copy()
+        clone._external_events = deque(self._external_events)
+        clone._internal_events = deque(self._internal_events)
+        clone._bound = []
+
+        clone._evaluator = self._evaluator_klass(clone)  # type: ignore
+        clone._evaluator.restore(copy.deepcopy(self._evaluator.snapshot()))
+        return clone
+
     def execute(self, max_steps: int=-1) -> List[model.MacroStep]:
         """
         Repeatedly calls *execute_once* and return a list containing
         the returned values of *execute_once*.
 
         Notice that this does NOT return an iterator but computes the whole list first
-        before returning it.
+        before returning it. See *iter_execute* for an iterator-based variant.
 
         :param max_steps: An upper bound on the number steps that are computed and returned.
             Default is -1, no limit. Set to a positive integer to avoid infinite loops
             in the statechart execution.
         :return: A list of *MacroStep* instances
         """
-        returned_steps = []
+        return list(self.iter_execute(max_steps))
+
+    def iter_execute(self, max_steps: int=-1) -> Iterator[model.MacroStep]:
+        """
+        Repeatedly calls *execute_once* and yields the returned values of *execute_once*
+        as soon as they are computed.
+
+        Each macro step is computed only when the next value is requested, so the returned
+        iterator can be lazily consumed, partially consumed or interleaved with other calls.
+
+        :param max_steps: An upper bound on the number steps that are computed and yielded.
+            Default is -1, no limit. Set to a positive integer to avoid infinite loops
+            in the statechart execution.
+        :return: An iterator of *MacroStep* instances
+        """
         i = 0
         macro_step = self.execute_once()
         while macro_step:
-            returned_steps.append(macro_step)
+            yield macro_step
             i += 1
             if 0 < max_steps == i:
                 break
             macro_step = self.execute_once()
-        return returned_steps
 
     def execute_once(self) -> model.MacroStep:
         """
@@ -188,6 +404,9 @@ class Interpreter:
                 )
                 computed_steps = self._create_steps(event, transitions)
 
+        if self._contract_policy is not None:
+            self._contract_policy.start_step()
+
         # Execute the steps
         executed_steps = []
         for step in computed_steps:
@@ -228,12 +447,16 @@ class Interpreter:
         :return: a list of *Transition* instances
         """
         transitions = []
+        event_name = getattr(event, 'name', None)
 
-        # Retrieve the firable transitions for all active state
-        for transition in self._statechart.transitions:
-            if (transition.event == getattr(event, 'name', None) and transition.source in self._configuration and
-                    (transition.guard is None or self._evaluator.evaluate_guard(transition, event))):
-                transitions.append(transition)
+        # Retrieve the firable transitions for all active state.
+        # The index is read directly: active states exist, and the lists are not modified here.
+        index = self._statechart._transitions_index
+        for name in self._configuration:
+            for transition in index.get(name, ()):
+                if transition.event == event_name and (
+                        transition.guard is None or self._evaluator.evaluate_guard(transition, event)):
+                    transitions.append(transition)
         return transitions
 
     def _filter_transitions(self, transitions: List[model.Transition]) -> List[model.Transition]:
@@ -244,15 +467,9 @@ class Interpreter:
         :param transitions: a list of *Transition* instances
         :return: a list of *Transition* instances
         """
-        removed_transitions = set()
-        for transition in transitions:
-            source_state_descendants = self._statechart.descendants_for(transition.source)
-            for other_transition in transitions:
-                if other_transition.source in source_state_descendants:
-                    removed_transitions.add(transition)
-                    break
-
-        return list(set(transitions).difference(removed_transitions))
+        # Keep the transitions whose source has no descendant among the other sources
+        leaves = set(self._statechart.leaf_for(transition.source for transition in transitions))
+        return [transition for transition in transitions if transition.source in leaves]
 
     def _sort_transitions(self, transitions: List[model.Transition]) -> List[model.Transition]:
         """
@@ -267,37 +484,22 @@ class Interpreter:
         if len(transitions) > 1:
             # If more than one transition, we check (1) they are from separate regions and (2) they do not conflict
             # Two transitions conflict if one of them leaves the parallel state
+            # The result of these checks only depends on the transitions, and is cached by the statechart.
+            hierarchy = self._statechart._hierarchy()
             for t1, t2 in combinations(transitions, 2):
-                # Check (1)
-                lca = self._statechart.least_common_ancestor(t1.source, t2.source)
-                lca_state = self._statechart.state_for(lca)
-
-                # Their LCA must be an orthogonal state!
-                if not isinstance(lca_state, model.OrthogonalState):
+                conflict = hierarchy.conflict_between(t1, t2)
+                if conflict is NonDeterminismError:
                     raise NonDeterminismError(
                         'Non-determinist choice between transitions {t1} and {t2}'
                         '\nConfiguration is {c}\nEvent is {e}\nTransitions are:{t}\n'
                         .format(c=self.configuration, e=t1.event, t=transitions, t1=t1, t2=t2)
                     )
-
-                # Check (2)
-                # This check must be done wrt. to LCA, as the combination of from_states could
-                # come from nested parallel regions!
-                for transition in [t1, t2]:
-                    last_before_lca = transition.source
-                    for state in self._statechart.ancestors_for(transition.source):
-                        if state == lca:
-                            break
-                        last_before_lca = state
-                    # Target must be a descendant (or self) of this state
-                    if (transition.target and
-                            (transition.target not in
-                             [last_before_lca] + self._statechart.descendants_for(last_before_lca))):
-                        raise ConflictingTransitionsError(
-                            'Conflicting transitions: {t1} and {t2}'
-                            '\nConfiguration is {c}\nEvent is {e}\nTransitions are:{t}\n'
-                            .format(c=self.configuration, e=t1.event, t=transitions, t1=t1, t2=t2)
-                        )
+                elif conflict is ConflictingTransitionsError:
+                    raise ConflictingTransitionsError(
+                        'Conflicting transitions: {t1} and {t2}'
+                        '\nConfiguration is {c}\nEvent is {e}\nTransitions are:{t}\n'
+                        .format(c=self.configuration, e=t1.event, t=transitions, t1=t1, t2=t2)
+                    )
 
             # Define an arbitrary order based on the depth and the name of source states.
             transitions = sorted(transitions, key=lambda t: (-self._statechart.depth_for(t.source), t.source))
@@ -321,38 +523,13 @@ class Interpreter:
                 returned_steps.append(model.MicroStep(event, transition, [], []))
                 continue
 
-            lca = self._statechart.least_common_ancestor(transition.source, transition.target)
-            from_ancestors = self._statechart.ancestors_for(transition.source)
-            to_ancestors = self._statechart.ancestors_for(transition.target)
-
-            # Exited states
-            exited_states = []
-
-            # last_before_lca is the "highest" ancestor of from_state that is a child of LCA
-            last_before_lca = transition.source
-            for state in from_ancestors:
-                if state == lca:
-                    break
-                last_before_lca = state
+            # The candidates to exit and the states to enter only depend on the transition
+            exit_candidates, entered_states = self._statechart._hierarchy().transition_paths(transition)
 
-            # Take all the descendants of this state and list the ones that are active
-            for descendant in self._statechart.descendants_for(last_before_lca)[::-1]:  # Mind the reversed order!
-                # Only leave states that are currently active
-                if descendant in self._configuration:
-                    exited_states.append(descendant)
+            # Only leave states that are currently active
+            exited_states = [name for name in exit_candidates if name in self._configuration]
 
-            # Add last_before_lca as it is a child of LCA that must be exited
-            if last_before_lca in self._configuration:
-                exited_states.append(last_before_lca)
-
-            # Entered states
-            entered_states = [transition.target]
-            for state in to_ancestors:
-                if state == lca:
-                    break
-                entered_states.insert(0, state)
-
-            returned_steps.append(model.MicroStep(event, transition, entered_states, exited_states))
+            returned_steps.append(model.MicroStep(event, transition, list(entered_states), exited_states))
 
         return returned_steps
 
@@ -401,7 +578,7 @@ class Interpreter:
         entered_states = list(map(self._statechart.state_for, step.entered_states))
         exited_states = list(map(self._statechart.state_for, step.exited_states))
 
-        active_configuration = set(self._configuration)  # Copy
+        active_configuration = self._configuration.copy()
 
         # Exit states
         for state in exited_states:
@@ -418,12 +595,13 @@ class Interpreter:
                     child = self._statechart.state_for(child_name)
                     if isinstance(child, model.DeepHistoryState):
                         # This MUST contain at least one element!
-                        active = active_configuration.intersection(self._statechart.descendants_for(state.name))
+                        active = active_configuration.descendants_for(state.name)
                         assert len(active) >= 1
                         self._memory[child.name] = list(active)
                     elif isinstance(child, model.ShallowHistoryState):
                         # This MUST contain exactly one element!
-                        active = active_configuration.intersection(self.statechart.children_for(state.name))
+                        active = [name for name in self._statechart.children_for(state.name)
+                                  if name in active_configuration]
                         assert len(active) == 1
                         self._memory[child.name] = list(active)
 
@@ -477,11 +655,44 @@ class Interpreter:
         :param obj: object with preconditions, postconditions or invariants
         :param cond_type: either "preconditions", "postconditions" or "invariants"
         :param step: step in which the check occurs.
-        :raises ContractError: if a condition fails and *ignore_contract* is False.
+        :raises ContractError: if a condition fails and *ignore_contract* is False, and if the contract policy
+            (if any) allows the check.
         """
         if self._ignore_contract:
             return
 
+        policy = self._contract_policy
+        if policy is not None:
+            if not any(getattr(obj, kind, None) for kind in ('preconditions', 'postconditions', 'invariants')):
+                return
+
+            if not policy.allows(obj):
+                if cond_type == 'preconditions':
+                    # The evaluator records the values needed by the postconditions and the invariants
+                    # (eg. __old__) when the preconditions are evaluated. Unsatisfied preconditions are
+                    # lazily computed, and are not consumed here.
+                    self._evaluator.evaluate_preconditions(obj, getattr(step, 'event', None))
+                return
+
+            starttime = perf_counter()
+            try:
+                self.__check_contract_conditions(obj, cond_type, step)
+            finally:
+                policy.spend(perf_counter() - starttime)
+        else:
+            self.__check_contract_conditions(obj, cond_type, step)
+
+    def __check_contract_conditions(self, obj: Union[model.Transition, model.StateMixin],
+                                    cond_type: str,
+                                    step: Union[model.MacroStep, model.MicroStep]=None) -> None:
+        """
+        Check the conditions for given object, regardless of the contract policy.
+
+        :param obj: object with preconditions, postconditions or invariants
+        :param cond_type: either "preconditions", "postconditions" or "invariants"
+        :param step: step in which the check occurs.
+        :raises ContractError: if a condition fails.
+        """
         exception_klass = cast(Callable[..., Exception], {'preconditions': PreconditionError,
                                                           'postconditions': PostconditionError,
                                                           'invariants': InvariantError}[cond_type])
@@ -496,6 +707,132 @@ class Interpreter:
         return '{}[{}]({})'.format(self.__class__.__name__, self._statechart, ', '.join(self.configuration))
 
 
+class BatchInterpreter:
+    """
+    A collection of interpreters for the same statechart, that are stepped together.
+
+    The batch interprets a frozen statechart (see *Statechart.freeze*), so that all the structural data that
+    are needed during the execution are computed once and shared by every interpreter of the batch. If the given
+    statechart is not frozen, a frozen copy of it is used instead, and the given statechart is left unchanged.
+    Compiled code is shared as well, and the nested contexts of the states are only created when they are needed.
+    Each interpreter only holds its own active configuration, history memory, event queues, timers and variables.
+
+    :param statechart: statechart to interpret (a frozen copy is made if it is not frozen)
+    :param evaluator_klass: An optional callable (eg. a class) that takes an interpreter and an optional initial
+        context as input and return an *Evaluator* instance that will be used to initialize each interpreter.
+        By default, the *PythonEvaluator* class will be used.
+    :param ignore_contract: set to True to ignore contract checking during the execution.
+    :raise StatechartError: if the statechart is not valid
+    """
+
+    def __init__(self, statechart: model.Statechart, *,
+                 evaluator_klass: Callable[['Interpreter'], Evaluator]=PythonEvaluator,
+                 ignore_contract: bool=False) -> None:
+        self._statechart = statechart if statechart.frozen else copy.deepcopy(statechart).freeze()
+        self._evaluator_klass = evaluator_klass
+        self._ignore_contract = ignore_contract
+
+        self._time = 0  # type: float  # Internal clock, shared by all the interpreters
+        self._interpreters = []  # type: List[Interpreter]
+
+    @property
+    def statechart(self) -> model.Statechart:
+        """
+        Embedded (frozen) statechart
+        """
+        return self._statechart
+
+    @property
+    def time(self) -> float:
+        """
+        Time value (in seconds) for the internal clock of every interpreter of this batch
+        """
+        return self._time
+
+    @time.setter
+    def time(self, value: float):
+        """
+        Set the time of the internal clock of every interpreter of this batch
+
+        :param value: time value (in seconds)
+        """
+        self._time = value
+        for interpreter in self._interpreters:
+            interpreter.time = value
+
+    @property
+    def final(self) -> bool:
+        """
+        Boolean indicating whether every interpreter of this batch is in a final configuration.
+        """
+        return all(interpreter.final for interpreter in self._interpreters)
+
+    def add(self, initial_context: Mapping=None) -> Interpreter:
+        """
+        Create a new interpreter for the statechart, and add it to this batch.
+        Its internal clock is set to the one of the batch.
+
+        :param initial_context: an optional initial context that will be provided to the evaluator.
+            By default, an empty context is provided
+        :return: the new *Interpreter* instance
+        """
+        interpreter = Interpreter(self._statechart, evaluator_klass=self._evaluator_klass,
+                                  initial_context=initial_context, ignore_contract=self._ignore_contract)
+        interpreter.time = self._time
+        self._interpreters.append(interpreter)
+        return interpreter
+
+    def queue(self, event: model.Event, indexes: Iterable[int]=None) -> 'BatchInterpreter':
+        """
+        Queue an event to the interpreters of this batch.
+
+        :param event: an *Event* or *InternalEvent* instance.
+        :param indexes: indexes of the interpreters that receive the event. By default, the event is
+            queued to every interpreter of this batch.
+        :return: *self* so it can be chained.
+        """
+        interpreters = self._interpreters if indexes is None else (self._interpreters[i] for i in indexes)
+        for interpreter in interpreters:
+            interpreter.queue(event)
+        return self
+
+    def execute(self, max_steps: int=-1) -> List[List[model.MacroStep]]:
+        """
+        Call *execute* on every interpreter of this batch that is not in a final configuration,
+        and return the list of their results (an empty list for the interpreters in a final configuration).
+
+        :param max_steps: An upper bound on the number steps that are computed and returned by
+            each interpreter. Default is -1, no limit.
+        :return: A list containing a list of *MacroStep* instances for each interpreter
+        """
+        return [
+            [] if interpreter.final else interpreter.execute(max_steps)
+            for interpreter in self._interpreters
+        ]
+
+    def next_deadline(self) -> Optional[float]:
+        """
+        Return the earliest deadline of the interpreters of this batch, or None if there is no
+        such deadline (see *Interpreter.next_deadline*).
+
+        :return: a time value or None
+        """
+        deadlines = [interpreter.next_deadline() for interpreter in self._interpreters]
+        return min((deadline for deadline in deadlines if deadline is not None), default=None)
+
+    def __len__(self) -> int:
+        return len(self._interpreters)
+
+    def __getitem__(self, index: int) -> Interpreter:
+        return self._interpreters[index]
+
+    def __iter__(self) -> Iterator[Interpreter]:
+        return iter(self._interpreters)
+
+    def __repr__(self):
+        return '{}[{}]({})'.format(self.__class__.__name__, self._statechart, len(self))
+
+
 def log_trace(interpreter: Interpreter) -> List[model.MacroStep]:
     """
     Return a list that will be populated by each value returned by the *execute_once* method
@@ -546,9 +883,95 @@ def run_in_background(interpreter: Interpreter,
     thread = threading.Thread(target=_task)
 
     def stop_thread():
-        interpreter._configuration = set()
+        interpreter._configuration.clear()
 
     thread.stop = stop_thread  # type: ignore
 
     thread.start()
     return thread
+
+
+def run_in_asyncio(interpreter: Interpreter,
+                   delay: float=None,
+                   callback: Callable[[List[model.MacroStep]], Any]=None,
+                   loop: Any=None) -> Any:
+    """
+    Run given interpreter in an asyncio event loop. The time is updated according to
+    *loop.time() - starttime*. The interpreter is ran until it reaches a final configuration.
+
+    Unlike *run_in_background*, no thread is used and the interpreter is not periodically polled:
+    the interpreter is executed as soon as an event is queued (the *queue* method of given interpreter is wrapped
+    for that purpose, and can be safely called from another thread), and when the next deadline of its time-based
+    guards is reached (see *Interpreter.next_deadline*). If *delay* is set, the interpreter is also executed if
+    nothing happened during the last *delay* seconds, for example to cope with guards that directly rely on the
+    current time. This allows many interpreters to share the same event loop.
+
+    The execution can be stopped by cancelling the returned future. In that case, the configuration of the
+    interpreter is left untouched, and its *queue* method is restored.
+
+    :param interpreter: an interpreter
+    :param delay: optional maximal delay between two calls to *execute()*
+    :param callback: a function that accepts the result of *execute*.
+    :param loop: an asyncio event loop, or None for the default one.
+    :return: an *asyncio.Future* that is done when the interpreter reaches a final configuration, or if
+        an exception occurs during its execution.
+    """
+    import asyncio
+
+    loop = asyncio.get_event_loop() if loop is None else loop
+    future = asyncio.Future(loop=loop)
+    starttime = loop.time()
+    state = {'timer': None, 'pending': False}  # type: Dict[str, Any]
+
+    def _execute():
+        state['pending'] = False
+        if state['timer'] is not None:
+            state['timer'].cancel()
+            state['timer'] = None
+        if future.done():
+            return
+
+        interpreter.time = loop.time() - starttime
+        try:
+            steps = interpreter.execute()
+            if callback:
+                callback(steps)
+        except Exception as e:
+            future.set_exception(e)
+            return
+
+        if interpreter.final:
+            future.set_result(None)
+            return
+
+        # Wait until next deadline, or until a new event is queued
+        deadline = interpreter.next_deadline()
+        wait = None if deadline is None else max(0, starttime + deadline - loop.time())
+        if delay is not None:
+            wait = delay if wait is None else min(wait, delay)
+        if wait is not None:
+            state['timer'] = loop.call_later(wait, _execute)
+
+    def _wakeup():
+        if not state['pending']:
+            state['pending'] = True
+            loop.call_soon(_execute)
+
+    func = interpreter.queue
+
+    @wraps(func)
+    def new_queue(event: model.Event) -> Interpreter:
+        func(event)
+        loop.call_soon_threadsafe(_wakeup)
+        return interpreter
+
+    def _stop(_):
+        interpreter.queue = func  # type: ignore
+        if state['timer'] is not None:
+            state['timer'].cancel()
+
+    interpreter.queue = new_queue  # type: ignore
+    future.add_done_callback(_stop)
+    _wakeup()
+
+    return future
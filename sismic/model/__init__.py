@@ -3,5 +3,6 @@ from .elements import ContractMixin, StateMixin, ActionStateMixin, \
 from .elements import BasicState, CompoundState, OrthogonalState, ShallowHistoryState, DeepHistoryState, FinalState
 from .elements import Transition
 from .statechart import Statechart
+from .configuration import Configuration
 from .steps import MicroStep, MacroStep
 from .events import Event, InternalEvent
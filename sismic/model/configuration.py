@@ -0,0 +1,129 @@
+import collections
+from typing import Iterable, Iterator, List
+
+from sismic.exceptions import StatechartError
+from .statechart import Statechart
+
+__all__ = ['Configuration']
+
+
+class Configuration(collections.MutableSet):
+    """
+    A set of state names (usually, the active configuration of an interpreter) that is backed
+    by an integer bitmask over the states of a statechart.
+
+    Membership tests, insertions and removals are constant-time operations, copying a configuration
+    only copies an integer, and the depth-ordered view (see *ordered*) is only recomputed
+    when the configuration changes. States are iterated in a depth-first (pre-order) traversal order.
+
+    :param statechart: the statechart (a *Statechart* instance) whose states are considered
+    :param names: an optional iterable of state names
+    :raise StatechartError: if a state does not exist
+    """
+
+    def __init__(self, statechart: Statechart, names: Iterable[str]=None) -> None:
+        self._statechart = statechart
+        self._hierarchy = statechart._hierarchy()
+        self._mask = 0
+
+        self._ordered = []  # type: List[str]  # See ordered
+        self._ordered_mask = 0  # Mask for which _ordered was computed
+
+        for name in (names if names is not None else []):
+            self.add(name)
+
+    def _position(self, name: str) -> int:
+        try:
+            return self._hierarchy.first[name]
+        except KeyError as e:
+            raise StatechartError('State {} does not exist'.format(name)) from e
+
+    @property
+    def mask(self) -> int:
+        """
+        The underlying bitmask, where bit *i* is set if the *i*-th state (in pre-order) belongs to this configuration.
+        """
+        return self._mask
+
+    @property
+    def ordered(self) -> List[str]:
+        """
+        List of the state names in this configuration, ordered by depth. Ties are broken according to the
+        lexicographic order on the state name. This list should not be modified.
+        """
+        if self._ordered_mask != self._mask:
+            depth = self._hierarchy.depth
+            self._ordered = sorted(self, key=lambda s: (depth[s], s))
+            self._ordered_mask = self._mask
+        return self._ordered
+
+    def add(self, name: str) -> None:
+        """
+        Add given state name.
+
+        :param name: name of a state
+        :raise StatechartError: if state does not exist
+        """
+        if self._mask == 0:
+            # An empty configuration can safely follow the changes made on the statechart
+            self._hierarchy = self._statechart._hierarchy()
+        self._mask |= 1 << self._position(name)
+
+    def discard(self, name: str) -> None:
+        """
+        Remove given state name, if present.
+
+        :param name: name of a state
+        """
+        position = self._hierarchy.first.get(name, None)
+        if position is not None:
+            self._mask &= ~(1 << position)
+
+    def clear(self) -> None:
+        """
+        Remove all state names.
+        """
+        self._mask = 0
+
+    def copy(self) -> 'Configuration':
+        """
+        Return a shallow copy of this configuration.
+
+        :return: a *Configuration* instance
+        """
+        configuration = Configuration.__new__(Configuration)
+        configuration.__dict__.update(self.__dict__)
+        return configuration
+
+    def descendants_for(self, name: str) -> List[str]:
+        """
+        Return the names in this configuration that are descendants of given state.
+
+        :param name: name of a state
+        :return: a (possibly empty) list of state names, in pre-order
+        :raise StatechartError: if state does not exist
+        """
+        first = self._position(name)
+        last = self._hierarchy.last[name]
+        mask = self._mask & ((1 << last) - (1 << (first + 1)))
+        return list(self._names(mask))
+
+    def _names(self, mask: int) -> Iterator[str]:
+        order = self._hierarchy.order
+        while mask:
+            lowest = mask & -mask
+            yield order[lowest.bit_length() - 1]
+            mask ^= lowest
+
+    def __contains__(self, name) -> bool:
+        position = self._hierarchy.first.get(name, None)
+        return position is not None and (self._mask >> position) & 1 == 1
+
+    def __iter__(self) -> Iterator[str]:
+        return self._names(self._mask)
+
+    def __len__(self) -> int:
+        return bin(self._mask).count('1')
+
+    def __repr__(self) -> str:
+        return '{}({})'.format(self.__class__.__name__, ', '.join(self))
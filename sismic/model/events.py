@@ -21,6 +21,9 @@ class Event:
                 self.data == other.data)
 
     def __getattr__(self, attr):
+        # *data* is not yet available when an event is being unpickled or copied
+        if 'data' not in self.__dict__:
+            raise AttributeError(attr)
         try:
             return self.data[attr]
         except:
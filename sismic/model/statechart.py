@@ -1,12 +1,166 @@
-from sismic.exceptions import StatechartError
+from sismic.exceptions import StatechartError, ExecutionError, NonDeterminismError, ConflictingTransitionsError
 from .elements import CompositeStateMixin, \
-    CompoundState, HistoryStateMixin, StateMixin, Transition, TransitionStateMixin
+    CompoundState, HistoryStateMixin, OrthogonalState, StateMixin, Transition, TransitionStateMixin
 
-from typing import Optional, List, Union, cast, Iterable
+from collections import deque
+from typing import Optional, List, Union, cast, Iterable, Tuple, Dict, Type
 
 __all__ = ['Statechart']
 
 
+class _Hierarchy:
+    """
+    Precomputed view on the hierarchy of the states of a statechart.
+
+    States are numbered according to a depth-first (pre-order) traversal of the hierarchy.
+    As a consequence, the descendants of a state are exactly the states whose number lies
+    in the half-open interval *[first[name] + 1, last[name])*.
+
+    :param statechart: a *Statechart* instance
+    """
+
+    def __init__(self, statechart: 'Statechart') -> None:
+        self.order = []  # type: List[str]  # pre-order traversal
+        self.first = {}  # type: Dict[str, int]  # name -> position in pre-order
+        self.last = {}  # type: Dict[str, int]  # name -> position after its last descendant
+        self.depth = {}  # type: Dict[str, int]  # name -> depth (1-indexed)
+        self.ancestors = {}  # type: Dict[str, Tuple[str, ...]]  # name -> ancestors, by decreasing depth
+        self.descendants = {}  # type: Dict[str, Tuple[str, ...]]  # name -> descendants, filled on demand
+        self.paths = {}  # type: Dict[int, Tuple[Tuple[str, ...], Tuple[str, ...]]]  # id(transition) -> paths
+        self.conflicts = {}  # type: Dict[Tuple[int, int], Optional[Type[ExecutionError]]]  # see conflict_between
+        self.orthogonal = frozenset(name for name, state in statechart._states.items()
+                                    if isinstance(state, OrthogonalState))
+
+        children = statechart._children
+        stack = [(name, None) for name in reversed(children[None])]  # type: List[Tuple[str, Optional[str]]]
+        exits = []  # type: List[Tuple[str, int]]
+        while stack:
+            name, parent = stack.pop()
+            if parent is None:
+                self.ancestors[name] = ()
+            else:
+                self.ancestors[name] = (parent, ) + self.ancestors[parent]
+            self.depth[name] = len(self.ancestors[name]) + 1
+            self.first[name] = len(self.order)
+            self.order.append(name)
+
+            # Close the subtrees that do not contain this state
+            while exits and exits[-1][1] >= self.depth[name]:
+                self.last[exits.pop()[0]] = self.first[name]
+            exits.append((name, self.depth[name]))
+
+            stack.extend((child, name) for child in reversed(children[name]))
+
+        for name, _ in exits:
+            self.last[name] = len(self.order)
+
+    def is_descendant(self, name: str, ancestor: str) -> bool:
+        """
+        Return True if *name* is a (strict) descendant of *ancestor*.
+        """
+        return self.first[ancestor] < self.first[name] < self.last[ancestor]
+
+    def descendants_for(self, name: str) -> Tuple[str, ...]:
+        """
+        Return the descendants of given state, by increasing depth (breadth-first order).
+        """
+        descendants = self.descendants.get(name, None)
+        if descendants is None:
+            ordered = []  # type: List[str]
+            states_to_consider = deque([name])
+            while states_to_consider:
+                # Children are contiguous in the pre-order, after their parent and its previous siblings
+                current = states_to_consider.popleft()
+                position = self.first[current] + 1
+                while position < self.last[current]:
+                    child = self.order[position]
+                    ordered.append(child)
+                    states_to_consider.append(child)
+                    position = self.last[child]
+            descendants = self.descendants.setdefault(name, tuple(ordered))
+        return descendants
+
+    def least_common_ancestor(self, name_first: str, name_second: str) -> Optional[str]:
+        """
+        Return the deepest state that is a (strict) ancestor of both given states, or None.
+        """
+        ancestors = self.ancestors[name_first]
+
+        # Ancestors of the first state that are also ancestors of the second one form a suffix of *ancestors*
+        low, high = 0, len(ancestors)
+        while low < high:
+            middle = (low + high) // 2
+            if self.is_descendant(name_second, ancestors[middle]):
+                high = middle
+            else:
+                low = middle + 1
+        return ancestors[low] if low < len(ancestors) else None
+
+    def conflict_between(self, first: Transition, second: Transition) -> Optional[Type[ExecutionError]]:
+        """
+        Check whether given transitions can be processed during the same step, ie. (1) their sources are in
+        separate regions of an orthogonal state and (2) none of them leaves the region of its source.
+
+        :return: None if they can, *NonDeterminismError* if (1) does not hold,
+            and *ConflictingTransitionsError* if (2) does not hold.
+        """
+        key = (id(first), id(second)) if id(first) < id(second) else (id(second), id(first))
+        try:
+            return self.conflicts[key]
+        except KeyError:
+            pass
+
+        # Check (1): their LCA must be an orthogonal state!
+        lca = self.least_common_ancestor(first.source, second.source)
+        if lca not in self.orthogonal:
+            return self.conflicts.setdefault(key, NonDeterminismError)
+
+        # Check (2): this check must be done wrt. to LCA, as the combination of sources could
+        # come from nested parallel regions!
+        for transition in [first, second]:
+            last_before_lca = transition.source
+            for state in self.ancestors[transition.source]:
+                if state == lca:
+                    break
+                last_before_lca = state
+            # Target must be a descendant (or self) of this state
+            if (transition.target and
+                    not self.first[last_before_lca] <= self.first[transition.target] < self.last[last_before_lca]):
+                return self.conflicts.setdefault(key, ConflictingTransitionsError)
+
+        return self.conflicts.setdefault(key, None)
+
+    def transition_paths(self, transition: Transition) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+        """
+        Return the states that may be exited and the states that are entered when given
+        (non-internal) transition is processed, both in the order they have to be exited or entered.
+        """
+        paths = self.paths.get(id(transition), None)
+        if paths is None:
+            source, target = transition.source, transition.target
+            lca = self.least_common_ancestor(source, target)
+
+            # last_before_lca is the "highest" ancestor of source that is a child of LCA
+            last_before_lca = source
+            for state in self.ancestors[source]:
+                if state == lca:
+                    break
+                last_before_lca = state
+
+            # Every descendant of last_before_lca, and last_before_lca itself (mind the reversed order!)
+            exited = self.descendants_for(last_before_lca)[::-1] + (last_before_lca, )
+
+            # Ancestors of target that are below LCA, and target
+            entered = [target]
+            for state in self.ancestors[target]:
+                if state == lca:
+                    break
+                entered.insert(0, state)
+
+            paths = self.paths.setdefault(id(transition), (exited, tuple(entered)))
+        return paths
+
+
 class Statechart:
     """
     Python structure for a statechart
@@ -25,17 +179,21 @@ class Statechart:
         self._parent = {}  # type: Dict[str, str]  # name -> parent.name
         self._children = {}  # type: Dict[str, List[str]]  # name -> list of names
         self._transitions = []  # type: List[Transition]  # list of Transition objects
+        # source -> list of Transition objects. Not keyed by event, as the event of a transition can be changed.
+        self._transitions_index = {}  # type: Dict[str, List[Transition]]
 
         self._children[None] = []  # Root state
 
+        self._hierarchy_cache = None  # type: Optional[_Hierarchy]  # See _hierarchy()
+        self._frozen = False
+
     @property
     def root(self) -> Optional[str]:
         """
         Root state name
         """
-        for name, parent in self._parent.items():
-            if parent is None:
-                return name
+        roots = self._children[None]
+        return roots[0] if roots else None
 
     @property
     def preamble(self):
@@ -44,6 +202,45 @@ class Statechart:
         """
         return self._preamble
 
+    @property
+    def frozen(self) -> bool:
+        """
+        Boolean indicating whether this statechart is frozen (see *freeze*).
+        """
+        return self._frozen
+
+    def freeze(self) -> 'Statechart':
+        """
+        Validate and freeze this statechart.
+
+        Once frozen, the structure of the statechart (its states and transitions) can no longer be modified, and
+        every structural query relies on data that are computed once for all. This is the recommended way to share
+        a statechart between many interpreters, or to interpret a statechart at a high event rate.
+        Notice that the attributes of the states and of the transitions (code, contracts, etc.) are not frozen.
+
+        :return: *self* so it can be chained
+        :raise StatechartError: if the statechart is not valid
+        """
+        self.validate()
+        self._frozen = True
+
+        # Precompute what is needed for the execution
+        hierarchy = self._hierarchy()
+        for transition in self._transitions:
+            if transition.target is not None:
+                hierarchy.transition_paths(transition)
+
+        return self
+
+    def _raise_if_frozen(self) -> None:
+        """
+        Raise a *StatechartError* if this statechart is frozen.
+
+        :raise StatechartError:
+        """
+        if self._frozen:
+            raise StatechartError('Statechart {} is frozen and cannot be modified'.format(self.name))
+
     # ######### STATES ##########
 
     @property
@@ -62,6 +259,8 @@ class Statechart:
         :param parent: name of its parent, or None
         :raise StatechartError:
         """
+        self._raise_if_frozen()
+
         # Check name unicity
         if state.name in self._states.keys():
             raise StatechartError('State {} already exists!'.format(state))
@@ -86,6 +285,7 @@ class Statechart:
                 raise StatechartError('{} cannot be used as a parent for {}'.format(parent_state, state))
 
         # Save state
+        self._hierarchy_cache = None
         self._states[state.name] = state
         self._parent[state.name] = parent
         self._children[state.name] = []
@@ -102,6 +302,8 @@ class Statechart:
         :param name: name of a state
         :raise StatechartError:
         """
+        self._raise_if_frozen()
+
         state = self.state_for(name)
 
         # Remove children
@@ -121,6 +323,7 @@ class Statechart:
                 o_state.memory = None
 
         # Remove state
+        self._hierarchy_cache = None
         self._states.pop(name)
         parent = self._parent.pop(name)
         self._children.pop(name)
@@ -134,6 +337,8 @@ class Statechart:
         :param old_name: old name of the state
         :param new_name: new name of the state
         """
+        self._raise_if_frozen()
+
         if old_name == new_name:
             return
         if new_name in self._states:
@@ -152,6 +357,9 @@ class Statechart:
             if transition.target == old_name:
                 transition._target = new_name
 
+        # Sources may have changed
+        self._rebuild_transitions_index()
+
         for other_state in self._states.values():
             # Change initial (CompoundState)
             if isinstance(other_state, CompoundState):
@@ -168,6 +376,7 @@ class Statechart:
                 self._parent[other_state.name] = new_name
 
         # Adapt structures
+        self._hierarchy_cache = None
         parent_name = self._parent[old_name]
         self._children[parent_name].remove(old_name)
         self._children[parent_name].append(new_name)
@@ -190,6 +399,8 @@ class Statechart:
         :param name: name of the state to move
         :param new_parent: name of the new parent
         """
+        self._raise_if_frozen()
+
         # Check that both states exist
         state = self.state_for(name)
         self.state_for(new_parent)
@@ -199,6 +410,7 @@ class Statechart:
             raise StatechartError('State {} cannot be moved into itself or one of its descendants.'.format(state))
 
         # Change its parent and register state as a child
+        self._hierarchy_cache = None
         old_parent = self.parent_for(name)
         self._parent[name] = new_parent
         self._children[old_parent].remove(name)
@@ -268,12 +480,7 @@ class Statechart:
         """
         self.state_for(name)  # Raise StatechartError if state does not exist
 
-        ancestors = []
-        parent = self._parent[name]
-        while parent:
-            ancestors.append(parent)
-            parent = self._parent[parent]
-        return ancestors
+        return list(self._hierarchy().ancestors[name])
 
     def descendants_for(self, name: str) -> List[str]:
         """
@@ -286,14 +493,7 @@ class Statechart:
         """
         self.state_for(name)  # Raise StatechartError if state does not exist
 
-        descendants = []
-        states_to_consider = [name]
-        while states_to_consider:
-            name = states_to_consider.pop(0)
-            for child in self.children_for(name):
-                states_to_consider.append(child)
-                descendants.append(child)
-        return descendants
+        return list(self._hierarchy().descendants_for(name))
 
     def depth_for(self, name: str) -> int:
         """
@@ -305,8 +505,7 @@ class Statechart:
         """
         self.state_for(name)  # Raise StatechartError if state does not exist
 
-        ancestors = self.ancestors_for(name)
-        return len(ancestors) + 1
+        return self._hierarchy().depth[name]
 
     def least_common_ancestor(self, name_first: str, name_second: str) -> str:
         """
@@ -321,11 +520,7 @@ class Statechart:
         self.state_for(name_first)  # Raise StatechartError if state does not exist
         self.state_for(name_second)
 
-        s1_anc = self.ancestors_for(name_first)
-        s2_anc = self.ancestors_for(name_second)
-        for state in s1_anc:
-            if state in s2_anc:
-                return state
+        return self._hierarchy().least_common_ancestor(name_first, name_second)
 
     def leaf_for(self, names: Iterable[str]) -> List[str]:
         """
@@ -338,17 +533,37 @@ class Statechart:
         :return: the names of the leaves in *names*
         :raise StatechartError: if a state does not exist
         """
-        leaves = []  # type: List[str]
-        names = set(names)  # Lookups in set are more efficient
-
+        names = set(names)
         for name in names:
-            for descendant in self.descendants_for(name):  # Raise a StatechartError if it does not exist!
-                if descendant in names:
-                    break
-            else:  # no break occurs
+            self.state_for(name)  # Raise StatechartError if state does not exist
+
+        # In pre-order, the descendants of a state immediately follow it
+        hierarchy = self._hierarchy()
+        ordered = sorted(names, key=hierarchy.first.__getitem__)
+        leaves = []  # type: List[str]
+        for name, following in zip(ordered, ordered[1:] + [None]):
+            if following is None or hierarchy.first[following] >= hierarchy.last[name]:
                 leaves.append(name)
         return leaves
 
+    def _hierarchy(self) -> _Hierarchy:
+        """
+        Return a precomputed view on the hierarchy of this statechart.
+        This view is built on demand, and discarded whenever a state is added, removed, renamed or moved.
+
+        :return: a *_Hierarchy* instance
+        """
+        if self._hierarchy_cache is None:
+            self._hierarchy_cache = _Hierarchy(self)
+        return self._hierarchy_cache
+
+    def __getstate__(self):
+        # The hierarchy caches transitions by id, which is meaningless in a copy
+        # or in another process. It is rebuilt on demand.
+        state = self.__dict__.copy()
+        state['_hierarchy_cache'] = None
+        return state
+
     # ######### TRANSITIONS ##########
 
     @property
@@ -365,6 +580,8 @@ class Statechart:
         :param transition: transition to add
         :raise StatechartError:
         """
+        self._raise_if_frozen()
+
         # Check that source state is known
         if transition.source not in self._states:
             raise StatechartError('Unknown source state for {}'.format(transition))
@@ -379,6 +596,7 @@ class Statechart:
             raise StatechartError('Unknown target state for {}'.format(transition))
 
         self._transitions.append(transition)
+        self._transitions_index.setdefault(transition.source, []).append(transition)
 
     def remove_transition(self, transition: Transition) -> None:
         """
@@ -387,10 +605,14 @@ class Statechart:
         :param transition: a *Transition* instance
         :raise StatechartError: if transition is not registered
         """
+        self._raise_if_frozen()
+
         try:
-            self._transitions.remove(transition)
+            removed = self._transitions.pop(self._transitions.index(transition))
         except ValueError:
             raise StatechartError('Transition {} does not exist'.format(transition))
+        self._unindex_transition(removed)
+        self._discard_transition_caches(removed)
 
     def rotate_transition(self, transition: Transition, new_source: str='', new_target: Optional[str]='') -> None:
         """
@@ -403,6 +625,8 @@ class Statechart:
         :param new_target: a state name or None
         :raise StatechartError: if given transition or a given state does not exist.
         """
+        self._raise_if_frozen()
+
         # Check that either new_source or new_target is set
         if new_source == new_target == '':
             raise ValueError('You must at least specify the new source or new target')
@@ -411,13 +635,17 @@ class Statechart:
         if transition not in self._transitions:
             raise StatechartError('Unknown transition {}'.format(transition))
 
+        self._discard_transition_caches(transition)
+
         # Rotate using source
         if new_source != '':
             new_source_state = self.state_for(new_source)
             if not isinstance(new_source_state, TransitionStateMixin):
                 raise StatechartError('{} cannot have transitions'.format(new_source_state))
             assert isinstance(new_source_state, StateMixin)
+            self._unindex_transition(transition)
             transition._source = new_source_state.name
+            self._transitions_index.setdefault(transition.source, []).append(transition)
 
         # Rotate using target
         if new_target != '':
@@ -443,6 +671,23 @@ class Statechart:
                 transitions.append(transition)
         return transitions
 
+    def transitions_for(self, source: str, event: Optional[str]=None) -> List[Transition]:
+        """
+        Return the list of transitions whose source is given name and that are triggered by
+        given event name, or the eventless ones if *event* is None.
+
+        This method relies on an index of the transitions by source state, that is kept up-to-date
+        by the methods of this class.
+
+        :param source: name of source state
+        :param event: name of the event, or None
+        :return: a list of *Transition* instances
+        :raise StatechartError: if state does not exist
+        """
+        self.state_for(source)  # Raise StatechartError if state does not exist
+
+        return [transition for transition in self._transitions_index.get(source, []) if transition.event == event]
+
     def transitions_to(self, target: str) -> List[Transition]:
         """
         Return the list of transitions whose target is given name.
@@ -473,6 +718,40 @@ class Statechart:
                 transitions.append(transition)
         return transitions
 
+    def _unindex_transition(self, transition: Transition) -> None:
+        """
+        Remove given transition (by identity) from the source index.
+        The whole index is searched, so that the transition is removed even if the index is not consistent
+        with its current source.
+
+        :param transition: a *Transition* instance
+        """
+        for source, indexed in list(self._transitions_index.items()):
+            for i, other in enumerate(indexed):
+                if other is transition:
+                    del indexed[i]
+                    if not indexed:
+                        del self._transitions_index[source]
+                    return
+
+    def _discard_transition_caches(self, transition: Transition) -> None:
+        """
+        Discard the data that were precomputed for given transition, if any.
+
+        :param transition: a *Transition* instance
+        """
+        if self._hierarchy_cache is not None:
+            self._hierarchy_cache.paths.pop(id(transition), None)
+            self._hierarchy_cache.conflicts.clear()
+
+    def _rebuild_transitions_index(self) -> None:
+        """
+        Rebuild the source index from the list of transitions.
+        """
+        self._transitions_index = {}
+        for transition in self._transitions:
+            self._transitions_index.setdefault(transition.source, []).append(transition)
+
     # ######### EVENTS ##########
 
     def events_for(self, name_or_names: Union[str, List[str]]=None) -> List[str]:
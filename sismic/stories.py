@@ -1,11 +1,20 @@
-from sismic.model import Event, InternalEvent
+from sismic.exceptions import ExecutionError
+from sismic.io import import_from_yaml
+from sismic.model import Event, InternalEvent, Statechart
 from sismic.model.steps import MacroStep
 from sismic.interpreter import Interpreter
 
+import copy
+import hashlib
+import os
+import pickle
 import random
-from typing import List, Generator, Union, Tuple, Iterable, Sequence
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Any, Callable, Dict, List, Generator, Iterator, Union, Tuple, Iterable, Sequence
 
-__all__ = ['Pause', 'Story', 'random_stories_generator', 'story_from_trace']
+__all__ = ['Pause', 'Story', 'random_stories_generator', 'story_from_trace', 'tell_in_parallel']
 
 Tellable = Union[Event, 'Pause']
 
@@ -38,43 +47,56 @@ class Story(list):
     A story is a sequence of *Event* and *Pause*.
 
     """
-    def tell(self, interpreter: Interpreter, *args, **kwargs) -> List[MacroStep]:
+    def tell(self, interpreter: Interpreter, *args, fast_forward: bool=False, **kwargs) -> List[MacroStep]:
         """
         Tells the whole story to the interpreter.
 
+        If *fast_forward* is set, each pause is told as a sequence of jumps to the next deadline of the
+        interpreter (see *Interpreter.next_deadline*), and the interpreter is executed at each of them.
+        Time-based transitions are therefore processed at their exact time, without executing the
+        interpreter at intermediate times.
+
         :param interpreter: an interpreter instance
         :param args: additional positional arguments that are passed to *interpreter.execute*.
+        :param fast_forward: if set, execute the interpreter at each deadline that occurs during a pause.
         :param kwargs: additional keywords arguments that are passed to *interpreter.execute*.
         :return: the resulting trace of execution (a list of *MacroStep*)
         """
         trace = []  # type: List[MacroStep]
-        for item in self:
-            if isinstance(item, Event):
-                interpreter.queue(item)
-            elif isinstance(item, Pause):
-                interpreter.time += item.duration
-            step = interpreter.execute(*args, **kwargs)
-            if step:
-                trace.extend(step)
+        for _, steps in self.tell_by_step(interpreter, *args, fast_forward=fast_forward, **kwargs):
+            trace.extend(steps)
         return trace
 
-    def tell_by_step(self, interpreter, *args, **kwargs) -> Generator[Tuple[Tellable, List[MacroStep]], None, None]:
+    def tell_by_step(self, interpreter, *args, fast_forward: bool=False,
+                     **kwargs) -> Generator[Tuple[Tellable, List[MacroStep]], None, None]:
         """
         Tells the story to the interpreter, step by step.
         This method returns a generator which yields the event or the pause that was told to the interpreter and
         the result of *interpreter.execute*.
 
+        If *fast_forward* is set, the steps that are yielded for a pause are the ones that were obtained by
+        executing the interpreter at each deadline that occurs during this pause (see *tell*).
+
         :param interpreter: an interpreter instance
         :param args: additional positional arguments that are passed to *interpreter.execute*.
+        :param fast_forward: if set, execute the interpreter at each deadline that occurs during a pause.
         :param kwargs: additional keywords arguments that are passed to *interpreter.execute*.
         :return: a generator that yields (told event or pause, result of *interpreter.execute*).
         """
         for item in self:
+            steps = []  # type: List[MacroStep]
             if isinstance(item, Event):
                 interpreter.queue(item)
             elif isinstance(item, Pause):
-                interpreter.time += item.duration
-            yield item, interpreter.execute(*args, **kwargs)
+                target = interpreter.time + item.duration
+                deadline = interpreter.next_deadline() if fast_forward else None
+                while deadline is not None and deadline < target:
+                    interpreter.time = deadline
+                    steps.extend(interpreter.execute(*args, **kwargs))
+                    deadline = interpreter.next_deadline()
+                interpreter.time = target
+            steps.extend(interpreter.execute(*args, **kwargs))
+            yield item, steps
 
     def __repr__(self):
         return 'Story({})'.format(super().__repr__())
@@ -124,3 +146,113 @@ def story_from_trace(trace: Iterable[MacroStep]) -> Story:
         if macrostep.event and not isinstance(macrostep.event, InternalEvent):
             story.append(macrostep.event)
     return story
+
+
+def tell_in_parallel(statechart: Union[Statechart, str], stories: Iterable[Story], *, workers: int=None,
+                     chunksize: int=16, tell: Callable[[Story, Interpreter], Any]=Story.tell,
+                     **kwargs) -> Iterator[Any]:
+    """
+    Tell each story to a new interpreter, using a pool of processes, and yield the results in the order of
+    the stories.
+
+    Stories are sent to the processes by chunks of *chunksize* stories, and at most two chunks per process are
+    submitted at once, so that *stories* can be a large (or infinite) iterable, such as the ones returned by
+    *random_stories_generator*. The statechart is loaded once per process.
+
+    By default, the result for a story is the trace returned by *Story.tell*. Any other callable that accepts
+    a story and an interpreter can be provided using *tell*, for example to tell stories in fast-forward mode
+    (eg. *functools.partial(Story.tell, fast_forward=True)*) or to summarize the execution instead of returning
+    the trace. This callable, its result, the stories and the parameters of the interpreter should be picklable.
+    If an exception is raised while a story is told (eg. a *ContractError*), it is raised again by this function,
+    and the remaining stories are not told. Exceptions that cannot be pickled are replaced by an *ExecutionError*
+    that describes them.
+
+    :param statechart: a *Statechart* instance or the path to a YAML file that describes it
+    :param stories: an iterable of stories
+    :param workers: number of processes to use (by default, the number of processors)
+    :param chunksize: number of stories that are sent to a process at once
+    :param tell: a callable that tells a story to an interpreter, and returns a result
+    :param kwargs: additional keyword arguments that are passed to *Interpreter* for each story.
+        The *initial_context* is copied for each story.
+    :return: an iterator over the results
+    :raise ExecutionError: if an exception that cannot be pickled is raised while a story is told
+    """
+    if isinstance(statechart, str):
+        source = statechart  # type: Union[str, bytes]
+    else:
+        source = pickle.dumps(statechart, protocol=pickle.HIGHEST_PROTOCOL)
+    stories = iter(stories)
+
+    workers = workers or os.cpu_count() or 1
+    max_pending = 2 * workers
+
+    with ProcessPoolExecutor(workers) as executor:
+        pending = deque()  # type: deque
+        try:
+            offset = 0
+            chunk = list(islice(stories, chunksize))
+            while len(chunk) > 0:
+                pending.append(executor.submit(_tell_stories, source, chunk, offset, tell, kwargs))
+                offset += len(chunk)
+                if len(pending) >= max_pending:
+                    yield from pending.popleft().result()
+                chunk = list(islice(stories, chunksize))
+
+            while len(pending) > 0:
+                yield from pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+# Statecharts that were loaded by a process, by path or by digest (see _load_statechart)
+_statecharts = {}  # type: Dict[Tuple[str, str], Statechart]
+
+
+def _load_statechart(source: Union[str, bytes]) -> Statechart:
+    """
+    Return the (frozen) statechart that corresponds to given source. Statecharts are loaded
+    once per process, and are then cached.
+
+    :param source: the path to a YAML file, or a pickled statechart
+    :return: a *Statechart* instance
+    """
+    if isinstance(source, str):
+        key = ('path', source)
+    else:
+        key = ('digest', hashlib.sha1(source).hexdigest())
+
+    statechart = _statecharts.get(key, None)
+    if statechart is None:
+        if isinstance(source, str):
+            with open(source) as f:
+                statechart = import_from_yaml(f)
+        else:
+            statechart = pickle.loads(source)
+        statechart = _statecharts.setdefault(key, statechart if statechart.frozen else statechart.freeze())
+    return statechart
+
+
+def _tell_stories(source: Union[str, bytes], stories: List[Story], offset: int,
+                  tell: Callable[[Story, Interpreter], Any], kwargs: Dict[str, Any]) -> List[Any]:
+    """
+    Tell given stories to new interpreters, and return the results.
+    This function is executed by worker processes, see *tell_in_parallel*.
+    """
+    statechart = _load_statechart(source)
+    kwargs = dict(kwargs)
+    initial_context = kwargs.pop('initial_context', None)
+
+    results = []
+    for i, story in enumerate(stories):
+        interpreter = Interpreter(statechart, initial_context=copy.deepcopy(initial_context), **kwargs)
+        try:
+            results.append(tell(story, interpreter))
+        except Exception as e:
+            try:
+                pickle.dumps(e, protocol=pickle.HIGHEST_PROTOCOL)
+            except Exception:
+                message = 'Story #{} cannot be told:\n{}: {}'.format(offset + i, e.__class__.__name__, e)
+                raise ExecutionError(message) from None
+            raise
+    return results
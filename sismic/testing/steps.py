@@ -2,6 +2,7 @@ from behave import given, when, then  # type: ignore
 from sismic.io import import_from_yaml
 from sismic.interpreter import Interpreter
 from sismic.model import Event
+from sismic.stories import Story, Pause
 
 
 # #################### GENERAL PURPOSE
@@ -118,6 +119,18 @@ def wait_seconds(context, seconds, repeat):
         wait_seconds_once(context, seconds)
 
 
+@given('I fast-forward {seconds:g} seconds')
+@given('I fast-forward {seconds:g} second')
+@when('I fast-forward {seconds:g} seconds')
+@when('I fast-forward {seconds:g} second')
+def fast_forward_seconds(context, seconds):
+    if context._automatic_execution:
+        steps = Story([Pause(seconds)]).tell(context._interpreter, fast_forward=True)
+        context._steps.extend(steps)
+    else:
+        context._interpreter.time += seconds
+
+
 @given('I set variable {variable_name} to {value}')
 def set_variable(context, variable_name, value):
     context._interpreter.context[variable_name] = eval(value, {}, {})
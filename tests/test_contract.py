@@ -1,6 +1,7 @@
+import pickle
 import unittest
 from sismic import io
-from sismic.interpreter import Interpreter
+from sismic.interpreter import Interpreter, ContractPolicy
 from sismic.model import Event, Transition, StateMixin
 from sismic.exceptions import PreconditionError, PostconditionError, InvariantError
 
@@ -37,6 +38,21 @@ class ElevatorContractTests(unittest.TestCase):
             self.interpreter.execute()
         self.assertTrue(isinstance(cm.exception.obj, StateMixin))
 
+    def test_pickle(self):
+        self.sc.state_for('movingUp').invariants.append('False')
+        self.interpreter._evaluator.context['Floor'] = type('Floor', (), {})  # Cannot be pickled
+        self.interpreter.queue(Event('floorSelected', floor=4))
+        with self.assertRaises(InvariantError) as cm:
+            self.interpreter.execute()
+
+        error = pickle.loads(pickle.dumps(cm.exception))
+        self.assertIsInstance(error, InvariantError)
+        self.assertEqual(error.obj.name, 'movingUp')
+        self.assertEqual(error.condition, 'False')
+        self.assertEqual(error.configuration, cm.exception.configuration)
+        self.assertEqual(error.context['destination'], 4)
+        self.assertNotIn('Floor', error.context)
+
     def test_transition_precondition(self):
         transitions = self.sc.transitions_from('floorSelecting')
         transitions[0].preconditions.append('False')
@@ -60,3 +76,98 @@ class ElevatorContractTests(unittest.TestCase):
         self.interpreter.queue(Event('floorSelected', floor=4))
         self.interpreter.execute()
 
+
+class ContractPolicyTests(unittest.TestCase):
+    def setUp(self):
+        with open('docs/examples/elevator.yaml') as f:
+            self.sc = io.import_from_yaml(f)
+        self.sc.state_for('movingUp').invariants.append('False')
+
+    def execute(self, policy):
+        interpreter = Interpreter(self.sc, contract_policy=policy)
+        interpreter.queue(Event('floorSelected', floor=4))
+        interpreter.execute()
+
+    def test_default_policy(self):
+        policy = ContractPolicy()
+        with self.assertRaises(InvariantError):
+            self.execute(policy)
+        self.assertEqual(policy.skipped, 0)
+        self.assertGreater(policy.checked, 0)
+
+    def test_states(self):
+        self.execute(ContractPolicy(states=['movingDown']))
+        with self.assertRaises(InvariantError):
+            self.execute(ContractPolicy(states=['movingUp']))
+
+    def test_transitions(self):
+        transition = self.sc.transitions_from('floorSelecting')[0]
+        transition.preconditions.append('False')
+        self.sc.state_for('movingUp').invariants.pop()
+
+        self.execute(ContractPolicy(transitions=[]))
+        with self.assertRaises(PreconditionError):
+            self.execute(ContractPolicy(transitions=[transition]))
+
+    def test_sample_rate(self):
+        policy = ContractPolicy(sample_rate=0)
+        self.execute(policy)
+        self.assertEqual(policy.checked, 0)
+        self.assertGreater(policy.skipped, 0)
+
+    def test_every(self):
+        # Only the first macro step is checked
+        policy = ContractPolicy(every=100)
+        self.execute(policy)
+        self.assertGreater(policy.skipped, 0)
+        with self.assertRaises(InvariantError):
+            self.execute(ContractPolicy(every=1))
+
+        # States entered during a skipped step are checked during the next checked steps
+        sc = io.import_from_yaml("""
+        statechart:
+          name: counter
+          root state:
+            name: root
+            initial: idle
+            states:
+              - name: idle
+                transitions:
+                  - target: s
+                    event: start
+              - name: s
+                on entry: x = 0
+                contract:
+                  - always: x < 3
+                transitions:
+                  - event: inc
+                    action: x += 1
+        """)
+        policy = ContractPolicy(every=2)
+        interpreter = Interpreter(sc, contract_policy=policy)
+        interpreter.queue(Event('start')).execute()  # Second step, s is entered
+
+        with self.assertRaises(InvariantError):
+            for _ in range(10):
+                interpreter.queue(Event('inc')).execute()
+        self.assertEqual(interpreter._evaluator.context_for('s')['x'], 3)
+
+    def test_time_budget(self):
+        policy = ContractPolicy(time_budget=0)
+        self.execute(policy)
+        self.assertEqual(policy.checked, 0)
+
+    def test_old_values_are_available(self):
+        with open('docs/examples/elevator_contract.yaml') as f:
+            sc = io.import_from_yaml(f)
+
+        for seed in range(20):
+            policy = ContractPolicy(sample_rate=0.5, seed=seed)
+            interpreter = Interpreter(sc, contract_policy=policy)
+            for floor in [4, 2, 0]:
+                interpreter.queue(Event('floorSelected', floor=floor))
+                interpreter.execute()
+            interpreter.time = 20
+            interpreter.execute()
+            self.assertGreater(policy.checked, 0)
+            self.assertGreater(policy.skipped, 0)
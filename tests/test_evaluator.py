@@ -1,9 +1,13 @@
+import os
+import tempfile
+import threading
 import unittest
-from unittest.mock import MagicMock
+from functools import partial
+from unittest.mock import MagicMock, patch
 from sismic import code
 from sismic.model import Event, InternalEvent
-from sismic.code.python import Context, FrozenContext
-from sismic.exceptions import CodeEvaluationError
+from sismic.code.python import Context, FrozenContext, _old_names, _invariant_dependencies
+from sismic.exceptions import CodeEvaluationError, InvariantError
 
 from sismic.io import import_from_yaml
 from sismic.interpreter import Interpreter
@@ -41,6 +45,20 @@ class FrozenContextTests(unittest.TestCase):
         self.context['a'] = 2
         self.assertEqual(freeze.a, 1)
 
+    def test_freeze_names(self):
+        freeze = FrozenContext(self.context, ['a', 'c'])
+        self.assertEqual(len(freeze), 1)
+        self.assertEqual(freeze.a, 1)
+        with self.assertRaises(AttributeError):
+            _ = freeze.b
+
+    def test_old_names(self):
+        self.assertEqual(_old_names(('x > __old__.x', '__old__.y == y')), {'x', 'y'})
+        self.assertEqual(_old_names(('x > 1',)), set())
+        self.assertIsNone(_old_names(('__old__.x == 1', 'len(__old__) > 0')))
+        self.assertIsNone(_old_names(('__old__["x"] == 1',)))
+        self.assertIsNone(_old_names(('x >',)))
+
 
 class ContextTests(unittest.TestCase):
     def setUp(self):
@@ -105,6 +123,114 @@ class ContextTests(unittest.TestCase):
         self.assertEqual(3, nested_2['b'])
         self.assertEqual(4, self.context['b'])
 
+    def test_len_and_iter_nested(self):
+        self.context['a'] = 1
+        nested = self.context.new_child({'a': 2, 'b': 3})
+        self.assertEqual(2, len(nested))
+        self.assertEqual(['a', 'b'], sorted(nested))
+        self.assertEqual({'a': 2, 'b': 3}, dict(nested))
+
+    def test_lookups_are_kept_up_to_date(self):
+        nested = self.context.new_child().new_child()
+        self.assertNotIn('a', nested)
+
+        # Adding a name to an ancestor
+        self.context['a'] = 1
+        self.assertIn('a', nested)
+        self.assertEqual(1, nested['a'])
+
+        # Shadowing and removing names
+        shadowing = nested.new_child({'a': 2})
+        self.assertEqual(2, shadowing['a'])
+        del shadowing['a']
+        self.assertEqual(1, shadowing['a'])
+        del nested['a']
+        self.assertNotIn('a', shadowing)
+        with self.assertRaises(KeyError):
+            _ = self.context['a']
+
+
+class CodeCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.cache = code.CodeCache(maxsize=2)
+
+    def test_compile(self):
+        compiled = self.cache.compile('1 + 1', 'eval')
+        self.assertEqual(eval(compiled), 2)
+        self.assertIs(self.cache.compile('1 + 1', 'eval'), compiled)
+        self.assertIsNot(self.cache.compile('1 + 1', 'exec'), compiled)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 2))
+
+    def test_lru_eviction(self):
+        first = self.cache.compile('a', 'eval')
+        self.cache.compile('b', 'eval')
+        self.cache.compile('a', 'eval')
+        self.cache.compile('c', 'eval')  # Evicts b
+        self.assertEqual(len(self.cache), 2)
+
+        self.assertIs(self.cache.compile('a', 'eval'), first)
+        self.cache.compile('b', 'eval')
+        self.assertEqual(self.cache.misses, 4)
+
+    def test_syntax_error(self):
+        with self.assertRaises(SyntaxError):
+            self.cache.compile('1 +', 'eval')
+        self.assertEqual(len(self.cache), 0)
+
+    def test_directory(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = code.CodeCache(directory=directory)
+            self.assertEqual(eval(cache.compile('x * 2', 'eval'), {'x': 2}), 4)
+            self.assertEqual(len(os.listdir(directory)), 1)
+
+            other_cache = code.CodeCache(directory=directory)
+            self.assertEqual(eval(other_cache.compile('x * 2', 'eval'), {'x': 3}), 6)
+            self.assertEqual(len(os.listdir(directory)), 1)
+
+            # Corrupted files are ignored and overwritten
+            path = os.path.join(directory, os.listdir(directory)[0])
+            with open(path, 'wb') as f:
+                f.write(b'garbage')
+            other_cache = code.CodeCache(directory=directory)
+            self.assertEqual(eval(other_cache.compile('x * 2', 'eval'), {'x': 4}), 8)
+
+    def test_shared_by_evaluators(self):
+        self.assertIs(code.PythonEvaluator(None).code_cache, code.PythonEvaluator(None).code_cache)
+
+    def test_statechart_code_is_not_evicted(self):
+        with open('docs/examples/elevator.yaml') as f:
+            sc = import_from_yaml(f)
+        shared_cache = code.PythonEvaluator.code_cache
+        self.addCleanup(setattr, code.PythonEvaluator, 'code_cache', shared_cache)
+        code.PythonEvaluator.code_cache = self.cache
+
+        interpreter = Interpreter(sc)
+        misses = self.cache.misses
+        self.assertGreater(misses, self.cache.maxsize)
+        for floor in [4, 0, 2]:
+            interpreter.queue(Event('floorSelected', floor=floor))
+            interpreter.time += 10
+            interpreter.execute()
+        Interpreter(sc).execute()
+        self.assertEqual(self.cache.misses, misses)
+
+    def test_threads(self):
+        cache = code.CodeCache(maxsize=8)
+        sources = ['x + {}'.format(i) for i in range(32)]
+
+        def compile_all():
+            for _ in range(20):
+                for source in sources:
+                    cache.compile(source, 'eval')
+
+        threads = [threading.Thread(target=compile_all) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(cache), 8)
+        self.assertEqual(cache.hits + cache.misses, 4 * 20 * 32)
+
 
 class PythonEvaluatorTests(unittest.TestCase):
     def setUp(self):
@@ -149,6 +275,11 @@ class PythonEvaluatorTests(unittest.TestCase):
         with self.assertRaises(CodeEvaluationError):
             self.evaluator._execute_code('x = x.y')
 
+    def test_active(self):
+        self.interpreter._configuration = {'s1'}
+        self.assertTrue(self.evaluator._evaluate_code('active("s1")'))
+        self.assertFalse(self.evaluator._evaluate_code('active("s2")'))
+
     def test_send(self):
         self.evaluator._execute_code('send("hello")')
         self.interpreter.queue.assert_called_with(InternalEvent('hello'))
@@ -211,3 +342,156 @@ class PythonEvaluatorNestedContextTests(unittest.TestCase):
         with self.assertRaises(KeyError):
             _ = s1['a']
 
+
+class PythonEvaluatorPrecompileTests(unittest.TestCase):
+    def setUp(self):
+        statechart = """
+        statechart:
+          name: test precompilation
+          preamble: x = 1
+          root state:
+            name: root
+            initial: s1
+            states:
+             - name: s1
+               on entry: x =
+               contract:
+                - after: x >
+               transitions:
+                - target: s2
+                  guard: x == 1
+                  action: x +=
+             - name: s2
+        """
+        self.sc = import_from_yaml(statechart)
+        self.cache = code.CodeCache()
+        self.evaluator = code.PythonEvaluator()
+        self.evaluator.code_cache = self.cache
+
+    def test_all_errors_are_reported(self):
+        with self.assertRaises(CodeEvaluationError) as cm:
+            self.evaluator.precompile(self.sc)
+
+        message = str(cm.exception)
+        self.assertIn('3 piece(s) of code', message)
+        self.assertIn('on entry of state s1', message)
+        self.assertIn('postcondition of state s1', message)
+        self.assertIn('action of transition s1 [None] -> s2', message)
+        self.assertNotIn('guard', message)
+
+    def test_cache_is_warmed(self):
+        self.sc.state_for('s1').on_entry = 'x = 2'
+        self.sc.state_for('s1').postconditions = ['x > 1']
+        self.sc.transitions_from('s1')[0].action = 'x += 1'
+
+        self.evaluator.precompile(self.sc)
+        self.assertEqual(len(self.cache), 5)
+        self.assertEqual(self.cache.misses, 5)
+
+    def test_interpreter_initialization(self):
+        with self.assertRaises(CodeEvaluationError):
+            Interpreter(self.sc)
+
+    def test_precompiled_once_per_statechart(self):
+        with open('docs/examples/elevator.yaml') as f:
+            sc = import_from_yaml(f)
+        with patch.object(code.PythonEvaluator, 'precompile', autospec=True) as precompile:
+            Interpreter(sc)
+            Interpreter(sc).fork()
+            self.assertEqual(precompile.call_count, 1)
+
+
+class PythonEvaluatorTransitionScopeTests(unittest.TestCase):
+    def setUp(self):
+        statechart = """
+        statechart:
+          name: test transition scopes
+          preamble: |
+            x = y = 0
+            getters = []
+          root state:
+            name: root
+            initial: s1
+            states:
+             - name: s1
+               transitions:
+                - event: e1
+                  action: |
+                    tmp = event.x
+                    x = tmp
+                - event: e3
+                  action: |
+                    getters.append(lambda: event.x)
+                    global g
+                    assert 'g' not in globals()
+                    g = event.x
+                - target: s2
+                  event: e2
+                  guard: "'tmp' not in locals() and event.x == x"
+                  action: y = time
+             - name: s2
+        """
+        self.intp = Interpreter(import_from_yaml(statechart))
+        self.intp.execute()
+
+    def test_scopes_are_reused(self):
+        self.intp.queue(Event('e1', x=1)).execute()
+        self.assertEqual(self.intp.context['x'], 1)
+
+        self.intp.queue(Event('e2', x=2)).execute()
+        self.assertEqual(self.intp.configuration, ['root', 's1'])
+
+        self.intp.time = 3
+        self.intp.queue(Event('e2', x=1)).execute()
+        self.assertEqual(self.intp.configuration, ['root', 's2'])
+        self.assertEqual(self.intp.context['y'], 3)
+        self.assertNotIn('tmp', self.intp._evaluator.context_for('s1'))
+
+    def test_actions_do_not_share_globals(self):
+        for x in [1, 2]:
+            self.intp.queue(Event('e3', x=x)).execute()
+        self.assertEqual([getter() for getter in self.intp.context['getters']], [1, 2])
+
+
+class PythonEvaluatorSkipInvariantsTests(unittest.TestCase):
+    def setUp(self):
+        with open('docs/examples/elevator_contract.yaml') as f:
+            self.sc = import_from_yaml(f)
+        evaluator_klass = partial(code.PythonEvaluator, skip_unchanged_invariants=True)
+        self.interpreter = Interpreter(self.sc, evaluator_klass=evaluator_klass)
+        self.evaluator = self.interpreter._evaluator
+
+    def test_dependencies(self):
+        self.assertEqual(_invariant_dependencies('x > 0 and len(y) == z.a'), ({'x', 'len', 'y', 'z'}, False))
+        self.assertEqual(_invariant_dependencies('x > __old__.x'), ({'x'}, False))
+        self.assertEqual(_invariant_dependencies('not active("s1")'), ({'active'}, True))
+        self.assertIsNone(_invariant_dependencies('time > 1'))
+        self.assertIsNone(_invariant_dependencies('f(x)'))
+        self.assertIsNone(_invariant_dependencies('x.count(1) > 0'))
+        self.assertIsNone(_invariant_dependencies('x >'))
+
+    def test_skipped_invariants(self):
+        self.interpreter.execute()
+        evaluated = self.evaluator.evaluated_invariants
+        self.assertEqual(self.evaluator.skipped_invariants, 0)
+
+        self.interpreter.queue(Event('floorSelected', floor=0)).execute()
+        self.assertGreater(self.evaluator.skipped_invariants, 0)
+        self.assertGreater(self.evaluator.evaluated_invariants, evaluated)
+
+    def test_changes_are_detected(self):
+        self.interpreter.execute()
+        self.interpreter.queue(Event('floorSelected', floor=0)).execute()
+
+        self.interpreter.context['current'] = -1
+        with self.assertRaises(InvariantError) as cm:
+            self.interpreter.queue(Event('unknown')).execute()
+        self.assertEqual(cm.exception.condition, 'current >= 0')
+
+    def test_same_behaviour(self):
+        interpreter = Interpreter(self.sc)
+        for floor in [4, 2, 0]:
+            for tested in [interpreter, self.interpreter]:
+                tested.queue(Event('floorSelected', floor=floor)).execute()
+            self.assertEqual(interpreter.configuration, self.interpreter.configuration)
+        self.assertGreater(self.evaluator.skipped_invariants, 0)
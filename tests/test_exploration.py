@@ -0,0 +1,177 @@
+import unittest
+from sismic import io
+from sismic.code import DummyEvaluator
+from sismic.exceptions import PreconditionError
+from sismic.exploration import explore, fingerprint, StoryFuzzer
+from sismic.interpreter import Interpreter
+from sismic.model import Event
+from sismic.stories import Pause, Story
+
+
+class ExploreTests(unittest.TestCase):
+    def setUp(self):
+        with open('tests/yaml/history.yaml') as f:
+            self.sc = io.import_from_yaml(f)
+        self.interpreter = Interpreter(self.sc, evaluator_klass=DummyEvaluator)
+        self.items = [Event('next'), Event('pause'), Event('continue')]
+
+    def test_exhaustive(self):
+        report = explore(self.interpreter, self.items)
+        # 3 states in loop and 1 pause state, with 4 (resp. 3) possible values for the memory of loop.H
+        self.assertEqual(report.situations, 15)
+        self.assertEqual(report.executions, 15 * 3)
+        self.assertTrue(report.complete)
+        self.assertEqual(report.unreachable_states, ['stop'])
+        self.assertEqual(report.unprocessed_transitions, self.sc.transitions_from('pause')[1:])
+        self.assertEqual(report.violations, [])
+
+    def test_interpreter_is_not_modified(self):
+        explore(self.interpreter, self.items)
+        self.assertEqual(self.interpreter.configuration, [])
+
+        self.interpreter.execute()
+        self.interpreter.queue(Event('pause')).execute()
+        report = explore(self.interpreter, [Event('stop')])
+        self.assertEqual(report.situations, 2)
+        self.assertEqual(self.interpreter.configuration, ['root', 'pause'])
+
+    def test_strategies(self):
+        bfs = explore(self.interpreter, self.items, strategy='bfs')
+        dfs = explore(self.interpreter, self.items, strategy='dfs')
+        self.assertEqual(bfs.situations, dfs.situations)
+        self.assertEqual(bfs.visited_states, dfs.visited_states)
+        self.assertEqual(bfs.processed_transitions, dfs.processed_transitions)
+
+        with self.assertRaises(ValueError):
+            explore(self.interpreter, self.items, strategy='random')
+
+    def test_limits(self):
+        report = explore(self.interpreter, self.items, max_depth=2)
+        self.assertFalse(report.complete)
+        self.assertEqual(report.depth, 2)
+        self.assertIn(self.sc.transitions_from('s3')[0], report.unprocessed_transitions)
+
+        report = explore(self.interpreter, self.items, strategy='dfs', max_depth=6)
+        self.assertEqual(report.situations, 15)
+
+        report = explore(self.interpreter, self.items, max_situations=3)
+        self.assertFalse(report.complete)
+        self.assertEqual(report.situations, 3)
+
+    def test_workers(self):
+        report = explore(self.interpreter, self.items, workers=2)
+        self.assertEqual(report.situations, 15)
+        self.assertTrue(report.complete)
+        self.assertEqual(report.unreachable_states, ['stop'])
+
+        with self.assertRaises(ValueError):
+            explore(self.interpreter, self.items, strategy='dfs', workers=2)
+
+    def test_fingerprint(self):
+        report = explore(self.interpreter, self.items, fingerprint=lambda interpreter: interpreter.configuration[-1])
+        self.assertEqual(report.situations, 4)  # Memory is ignored
+
+    def test_fingerprint_of_nested_contexts(self):
+        sc = io.import_from_yaml("""
+        statechart:
+          name: counter
+          root state:
+            name: root
+            initial: s
+            states:
+              - name: s
+                on entry: x = 0
+                transitions:
+                  - event: inc
+                    action: x += 1
+                  - target: done
+                    guard: x >= 2
+              - name: done
+        """)
+        report = explore(Interpreter(sc), [Event('inc')], max_depth=5)
+        self.assertEqual(report.situations, 3)
+        self.assertTrue(report.complete)
+        self.assertEqual(report.unreachable_states, [])
+
+
+class ExploreContractTests(unittest.TestCase):
+    def setUp(self):
+        with open('docs/examples/elevator_contract.yaml') as f:
+            self.sc = io.import_from_yaml(f)
+        self.items = [Event('floorSelected', floor=1)]
+
+    def test_fingerprint_depends_on_time(self):
+        interpreter = Interpreter(self.sc)
+        Story([Event('floorSelected', floor=1)]).tell(interpreter)
+        fork = interpreter.fork()
+        self.assertEqual(fingerprint(fork), fingerprint(interpreter))
+        fork.time += 1
+        self.assertNotEqual(fingerprint(fork), fingerprint(interpreter))
+
+    def test_no_violation(self):
+        report = explore(Interpreter(self.sc), self.items)
+        self.assertEqual(report.violations, [])
+        self.assertEqual(report.unreachable_states, ['movingDown'])
+
+        report = explore(Interpreter(self.sc), self.items + [Pause(10)])
+        self.assertEqual(report.unreachable_states, [])
+
+    def test_violations(self):
+        self.sc.state_for('movingUp').preconditions[0] = 'current > destination'
+        for workers in [None, 2]:
+            report = explore(Interpreter(self.sc), self.items, workers=workers)
+            self.assertEqual(len(report.violations), 1)
+            story, error = report.violations[0]
+            self.assertEqual(story, Story([Event('floorSelected', floor=1)]))
+            self.assertIsInstance(error, PreconditionError)
+
+
+class StoryFuzzerTests(unittest.TestCase):
+    def setUp(self):
+        with open('tests/yaml/history.yaml') as f:
+            self.sc = io.import_from_yaml(f)
+        self.interpreter = Interpreter(self.sc, evaluator_klass=DummyEvaluator)
+        self.items = [Event('next'), Event('pause'), Event('continue')]
+
+    def test_coverage(self):
+        fuzzer = StoryFuzzer(self.interpreter, self.items, seed=0)
+        self.assertEqual(fuzzer.visited_states, ['loop', 'root', 's1'])
+
+        fuzzer.run(200)
+        self.assertEqual(fuzzer.executions, 200)
+        self.assertEqual(fuzzer.unreachable_states, ['stop'])
+        self.assertEqual(fuzzer.unprocessed_transitions, self.sc.transitions_from('pause')[1:])
+        self.assertEqual(self.interpreter.configuration, [])
+
+    def test_corpus(self):
+        fuzzer = StoryFuzzer(self.interpreter, self.items, corpus=[[Event('next')], [Event('next')]], seed=0)
+        fuzzer.run(2)
+        self.assertEqual(fuzzer.corpus, [Story([Event('next')])])
+
+        coverage = fuzzer.coverage
+        self.assertFalse(fuzzer.execute(Story([Event('next'), Event('continue')])))
+        self.assertTrue(fuzzer.execute(Story([Event('pause')])))
+        self.assertNotEqual(fuzzer.coverage, coverage)
+        self.assertEqual(len(fuzzer.corpus), 2)
+
+    def test_mutate(self):
+        fuzzer = StoryFuzzer(self.interpreter, self.items, max_length=3, seed=0)
+        story = Story([Event('next')])
+        for _ in range(50):
+            mutation = fuzzer.mutate(story)
+            self.assertLessEqual(len(mutation), 3)
+            self.assertTrue(all(item in self.items for item in mutation))
+        self.assertEqual(story, Story([Event('next')]))
+
+    def test_failures(self):
+        with open('docs/examples/elevator_contract.yaml') as f:
+            sc = io.import_from_yaml(f)
+        sc.state_for('movingUp').preconditions[0] = 'current > destination'
+        items = [Event('floorSelected', floor=i) for i in range(3)] + [Pause(10)]
+
+        fuzzer = StoryFuzzer(Interpreter(sc), items, seed=0).run(100)
+        self.assertEqual(len(fuzzer.failures), 1)
+        story, error = fuzzer.failures[0]
+        self.assertIsInstance(error, PreconditionError)
+        self.assertIsInstance(story[-1], Event)
+        self.assertGreater(story[-1].floor, 0)
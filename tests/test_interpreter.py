@@ -1,8 +1,11 @@
+import asyncio
+import math
 import unittest
+from functools import partial
 from sismic import io
-from sismic.interpreter import Interpreter, run_in_background, log_trace
+from sismic.interpreter import Interpreter, BatchInterpreter, run_in_background, run_in_asyncio, log_trace
 from sismic import exceptions
-from sismic.code import DummyEvaluator
+from sismic.code import DummyEvaluator, PythonEvaluator
 from sismic.model import Event, InternalEvent
 
 
@@ -38,6 +41,345 @@ class RunInBackgroundTests(unittest.TestCase):
         self.assertTrue(interpreter.final)
 
 
+class RunInAsyncioTests(unittest.TestCase):
+    def setUp(self):
+        with open('tests/yaml/simple.yaml') as f:
+            sc = io.import_from_yaml(f)
+        self.interpreter = Interpreter(sc)
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def test_run_in_asyncio(self):
+        steps = []
+        task = run_in_asyncio(self.interpreter, callback=steps.extend, loop=self.loop)
+        self.interpreter.queue(Event('goto s2'))
+        self.loop.call_soon(self.interpreter.queue, Event('goto final'))
+        self.loop.run_until_complete(task)
+
+        self.assertTrue(self.interpreter.final)
+        self.assertEqual(steps[-1].entered_states, ['final'])
+
+    def test_cancel(self):
+        queue = self.interpreter.queue
+        task = run_in_asyncio(self.interpreter, delay=0.001, loop=self.loop)
+        self.assertNotEqual(self.interpreter.queue, queue)
+
+        self.loop.call_later(0.01, task.cancel)
+        with self.assertRaises(asyncio.CancelledError):
+            self.loop.run_until_complete(task)
+
+        self.assertEqual(self.interpreter.queue, queue)
+        self.assertEqual(self.interpreter.configuration, ['root', 's1'])
+
+    def test_exception(self):
+        self.interpreter.queue(Event('goto s2'))
+        task = run_in_asyncio(self.interpreter, callback=lambda steps: 1 / 0, loop=self.loop)
+        with self.assertRaises(ZeroDivisionError):
+            self.loop.run_until_complete(task)
+
+
+class NextDeadlineTests(unittest.TestCase):
+    def setUp(self):
+        with open('tests/yaml/timer.yaml') as f:
+            sc = io.import_from_yaml(f)
+        self.interpreter = Interpreter(sc)
+
+    def test_no_deadline(self):
+        self.assertIsNone(self.interpreter.next_deadline())
+        interpreter = Interpreter(self.interpreter.statechart, evaluator_klass=DummyEvaluator)
+        interpreter.execute()
+        self.assertIsNone(interpreter.next_deadline())
+
+    def test_deadlines(self):
+        self.interpreter.execute()
+        self.assertEqual(self.interpreter.configuration, ['root', 's1'])
+        self.assertEqual(self.interpreter.next_deadline(), 3)
+
+        self.interpreter.time = 2
+        self.interpreter.execute()
+        self.assertEqual(self.interpreter.next_deadline(), 3)
+
+        self.interpreter.time = 3
+        self.interpreter.execute()
+        self.assertEqual(self.interpreter.configuration, ['root', 's2'])
+        self.assertEqual(self.interpreter.next_deadline(), 5)
+
+        self.interpreter.time = 5
+        self.interpreter.execute()
+        self.assertEqual(self.interpreter.configuration, ['root', 's3'])
+        self.assertEqual(self.interpreter.next_deadline(), 7)
+
+        self.interpreter.time = 7
+        self.interpreter.execute()
+        self.assertTrue(self.interpreter.final)
+        self.assertIsNone(self.interpreter.next_deadline())
+
+    def test_deadline_of_exited_state(self):
+        self.interpreter.execute()
+        self.assertEqual(self.interpreter.next_deadline(), 3)
+        self.interpreter._configuration.discard('s1')
+        self.assertIsNone(self.interpreter.next_deadline())
+
+    def test_deadline_rounding(self):
+        sc = io.import_from_yaml("""
+        statechart:
+          name: rounding
+          root state:
+            name: root
+            initial: s1
+            states:
+              - name: s1
+                transitions:
+                  - target: s2
+                    guard: after(0.4)
+              - name: s2
+        """)
+        interpreter = Interpreter(sc)
+        interpreter.time = 0.1
+        interpreter.execute()
+
+        # 0.5 - 0.4 < 0.1 with floats, while 0.1 + 0.4 == 0.5
+        interpreter.time = 0.5
+        interpreter.execute()
+        self.assertEqual(interpreter.configuration, ['root', 's1'])
+        self.assertGreater(interpreter.next_deadline(), 0.5)
+
+        interpreter.time = interpreter.next_deadline()
+        interpreter.execute()
+        self.assertEqual(interpreter.configuration, ['root', 's2'])
+
+    def test_deadlines_do_not_accumulate(self):
+        sc = io.import_from_yaml("""
+        statechart:
+          name: idle
+          root state:
+            name: s
+            transitions:
+              - event: tick
+              - target: s
+                guard: idle(100)
+        """)
+        interpreter = Interpreter(sc)
+        for i in range(1000):
+            interpreter.time = i
+            interpreter.queue(Event('tick')).execute()
+        self.assertEqual(len(interpreter._evaluator.snapshot()['deadlines']), 1)
+        self.assertEqual(interpreter.next_deadline(), 1099)
+
+    def test_run_in_asyncio(self):
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        for name, guard in [('s1', 'after(0.01)'), ('s2', 'after(0.01)'), ('s3', 'idle(0.01)')]:
+            self.interpreter.statechart.transitions_from(name)[0].guard = guard
+
+        steps = []
+        task = run_in_asyncio(self.interpreter, callback=steps.extend, loop=loop)
+        loop.run_until_complete(task)
+        self.assertTrue(self.interpreter.final)
+        self.assertEqual([step.entered_states for step in steps][-3:], [['s2'], ['s3'], ['s4']])
+
+
+class BatchInterpreterTests(unittest.TestCase):
+    def setUp(self):
+        with open('tests/yaml/timer.yaml') as f:
+            self.sc = io.import_from_yaml(f)
+        self.batch = BatchInterpreter(self.sc)
+
+    def test_statechart_is_frozen(self):
+        self.assertTrue(self.batch.statechart.frozen)
+        self.assertFalse(self.sc.frozen)
+        self.assertIsNot(self.batch.statechart, self.sc)
+        self.assertEqual(self.batch.statechart.states, self.sc.states)
+
+        self.sc.freeze()
+        self.assertIs(BatchInterpreter(self.sc).statechart, self.sc)
+
+    def test_add(self):
+        self.batch.time = 1
+        interpreter = self.batch.add(initial_context={'x': 1})
+        self.assertEqual(len(self.batch), 1)
+        self.assertIs(self.batch[0], interpreter)
+        self.assertEqual(list(self.batch), [interpreter])
+        self.assertEqual(interpreter.time, 1)
+        self.assertEqual(interpreter.context['x'], 1)
+
+    def test_execute(self):
+        for _ in range(3):
+            self.batch.add()
+        self.assertEqual([len(steps) for steps in self.batch.execute()], [1, 1, 1])
+        self.assertEqual(self.batch.next_deadline(), 3)
+
+        self.batch.time = 3
+        self.batch[0].time = 2
+        self.assertEqual([len(steps) for steps in self.batch.execute()], [0, 1, 1])
+        self.assertEqual(self.batch[0].configuration, ['root', 's1'])
+        self.assertEqual(self.batch[1].configuration, ['root', 's2'])
+        self.assertEqual(self.batch.next_deadline(), 3)
+
+        while self.batch.next_deadline() is not None:
+            self.batch.time = self.batch.next_deadline()
+            self.batch.execute()
+        self.assertTrue(self.batch.final)
+        self.assertEqual(self.batch.time, 7)
+        self.assertIsNone(self.batch.next_deadline())
+        self.assertEqual(self.batch.execute(), [[], [], []])
+
+    def test_queue(self):
+        with open('tests/yaml/simple.yaml') as f:
+            batch = BatchInterpreter(io.import_from_yaml(f))
+        for _ in range(3):
+            batch.add()
+        batch.execute()
+
+        batch.queue(Event('goto s2')).queue(Event('goto final'), indexes=[1])
+        batch.execute()
+        self.assertEqual([interpreter.final for interpreter in batch], [False, True, False])
+        self.assertEqual(batch[0].configuration, ['root', 's3'])
+
+
+class SnapshotTests(unittest.TestCase):
+    def setUp(self):
+        with open('docs/examples/elevator_contract.yaml') as f:
+            self.sc = io.import_from_yaml(f)
+        self.interpreter = Interpreter(self.sc)
+
+    def test_restore(self):
+        self.interpreter.queue(Event('floorSelected', floor=4))
+        self.interpreter.execute(max_steps=5)
+        self.assertIn('moving', self.interpreter.configuration)  # __old__ is needed for its postconditions
+        self.interpreter.queue(Event('floorSelected', floor=2))
+        snapshot = self.interpreter.snapshot()
+
+        restored = Interpreter(self.sc).restore(snapshot)
+        self.assertEqual(restored.time, self.interpreter.time)
+        self.assertEqual(restored.configuration, self.interpreter.configuration)
+        self.assertEqual(dict(restored.context), dict(self.interpreter.context))
+
+        for interpreter in [self.interpreter, restored]:
+            interpreter.execute()
+            interpreter.time = 20
+            interpreter.execute()
+        self.assertEqual(restored.configuration, self.interpreter.configuration)
+        self.assertEqual(dict(restored.context), dict(self.interpreter.context))
+        self.assertEqual(restored.context['current'], 0)
+
+    def test_restore_does_not_share_state(self):
+        self.interpreter.execute()
+        snapshot = self.interpreter.snapshot()
+        self.interpreter.queue(Event('floorSelected', floor=4)).execute()
+
+        restored = Interpreter(self.sc).restore(snapshot)
+        self.assertEqual(restored.context['current'], 0)
+        self.assertEqual(self.interpreter.restore(snapshot).context['current'], 0)
+        self.assertEqual(self.interpreter.execute(), [])
+
+    def test_restore_with_another_evaluator(self):
+        self.interpreter.queue(Event('floorSelected', floor=4)).execute()
+        snapshot = self.interpreter.snapshot()
+
+        evaluator_klass = partial(PythonEvaluator, skip_unchanged_invariants=True)
+        restored = Interpreter(self.sc, evaluator_klass=evaluator_klass).restore(snapshot)
+        restored.time = 20
+        restored.execute()
+        self.assertEqual(restored.context['current'], 0)
+        self.assertGreater(restored._evaluator.skipped_invariants, 0)
+
+        self.interpreter.restore(restored.snapshot())
+        self.interpreter.execute()
+        self.assertEqual(self.interpreter.context['current'], 0)
+
+    def test_restore_timers(self):
+        with open('tests/yaml/timer.yaml') as f:
+            sc = io.import_from_yaml(f)
+        interpreter = Interpreter(sc)
+        interpreter.time = 1
+        interpreter.execute()
+        self.assertEqual(interpreter.next_deadline(), 4)
+
+        restored = Interpreter(sc).restore(interpreter.snapshot())
+        self.assertEqual(restored.next_deadline(), 4)
+        restored.time = 4
+        restored.execute()
+        self.assertEqual(restored.configuration, ['root', 's2'])
+
+    def test_restore_history(self):
+        with open('tests/yaml/history.yaml') as f:
+            sc = io.import_from_yaml(f)
+        interpreter = Interpreter(sc, evaluator_klass=DummyEvaluator)
+        interpreter.queue(Event('next')).queue(Event('pause')).execute()
+        interpreter.queue(Event('continue'))
+
+        restored = Interpreter(sc, evaluator_klass=DummyEvaluator).restore(interpreter.snapshot())
+        self.assertEqual(restored.configuration, ['root', 'pause'])
+        step = restored.execute_once()
+        self.assertEqual(step.entered_states, ['loop', 'loop.H', 's2'])
+
+    def test_restore_modules(self):
+        self.interpreter.context['math'] = math
+        restored = Interpreter(self.sc).restore(self.interpreter.snapshot())
+        self.assertIs(restored.context['math'], math)
+        self.assertIs(self.interpreter.fork().context['math'], math)
+
+    def test_restore_other_statechart(self):
+        with open('tests/yaml/timer.yaml') as f:
+            sc = io.import_from_yaml(f)
+        with self.assertRaises(exceptions.ExecutionError):
+            Interpreter(sc).restore(self.interpreter.snapshot())
+
+
+class ForkTests(unittest.TestCase):
+    def setUp(self):
+        with open('docs/examples/elevator_contract.yaml') as f:
+            self.sc = io.import_from_yaml(f)
+        self.interpreter = Interpreter(self.sc, initial_context={'log': []})
+        self.interpreter.queue(Event('floorSelected', floor=4))
+        self.interpreter.execute(max_steps=5)
+
+    def test_fork(self):
+        fork = self.interpreter.fork()
+        self.assertIsInstance(fork, Interpreter)
+        self.assertIs(fork.statechart, self.interpreter.statechart)
+        self.assertEqual(fork.time, self.interpreter.time)
+        self.assertEqual(fork.configuration, self.interpreter.configuration)
+        self.assertEqual(dict(fork.context), dict(self.interpreter.context))
+
+    def test_independent_executions(self):
+        fork = self.interpreter.fork()
+        fork.context['log'].append(1)
+        fork.queue(Event('floorSelected', floor=1))
+        fork.execute()
+        self.interpreter.execute()
+
+        self.assertEqual(self.interpreter.context['log'], [])
+        self.assertEqual(self.interpreter.context['current'], 4)
+        self.assertEqual(fork.context['current'], 1)
+
+        fork.time = self.interpreter.time = 20
+        self.assertEqual(len(fork.execute()), 3)
+        self.assertEqual(len(self.interpreter.execute()), 6)
+        self.assertEqual(fork.context['log'], [1])
+
+    def test_queued_events(self):
+        self.interpreter.queue(Event('floorSelected', floor=2))
+        fork = self.interpreter.fork()
+        self.interpreter.execute()
+        fork.execute()
+        self.assertEqual(fork.context['destination'], 2)
+        self.assertEqual(fork.context['destination'], self.interpreter.context['destination'])
+
+    def test_replaced_methods_and_bound_callables(self):
+        steps = log_trace(self.interpreter)
+        events = []
+        self.interpreter.bind(events.append)
+
+        fork = self.interpreter.fork()
+        fork.queue(Event('floorSelected', floor=1)).execute()
+        self.assertEqual(steps, [])
+        self.assertEqual(events, [])
+
+
 class SimulatorSimpleTests(unittest.TestCase):
     def setUp(self):
         with open('tests/yaml/simple.yaml') as f:
@@ -83,6 +425,23 @@ class SimulatorSimpleTests(unittest.TestCase):
         self.interpreter.execute()
         self.assertTrue(self.interpreter.final)
 
+    def test_transition_event_is_changed(self):
+        sc = self.interpreter.statechart
+        transition = sc.transitions_from('s1')[0]
+        transition.event = 'renamed'
+        self.interpreter.queue(Event('goto s2')).execute()
+        self.assertEqual(self.interpreter.configuration, ['root', 's1'])
+        self.interpreter.queue(Event('renamed')).execute_once()
+        self.assertEqual(self.interpreter.configuration, ['root', 's2'])
+
+    def test_transition_is_removed_after_event_change(self):
+        sc = self.interpreter.statechart
+        transition = sc.transitions_from('s1')[0]
+        transition.event = 'renamed'
+        sc.remove_transition(transition)
+        self.interpreter.queue(Event('goto s2')).queue(Event('renamed')).execute()
+        self.assertEqual(self.interpreter.configuration, ['root', 's1'])
+
 
 class InternalTests(unittest.TestCase):
     def setUp(self):
@@ -240,6 +599,21 @@ class InfiniteExecutionTests(unittest.TestCase):
         self.assertEqual(self.interpreter.configuration, ['root', 's2'])
         self.assertEqual(self.interpreter.context['x'], 2)  # x is incremented in s1.on_entry
 
+    def test_iter_execute(self):
+        steps = self.interpreter.iter_execute(max_steps=3)
+        self.assertEqual(self.interpreter.context['x'], 1)
+
+        next(steps)
+        self.assertEqual(self.interpreter.configuration, ['root', 's2'])
+        self.assertEqual(len(list(steps)), 2)
+        self.assertEqual(self.interpreter.context['x'], 2)
+
+    def test_iter_execute_auto_stop(self):
+        steps = list(self.interpreter.iter_execute())
+        self.assertEqual(steps[-1].entered_states, ['stop'])
+        self.assertTrue(self.interpreter.final)
+        self.assertEqual(self.interpreter.context['x'], 100)
+
     def test_auto_stop(self):
         self.interpreter.execute()
 
@@ -288,6 +662,18 @@ class ParallelExecutionTests(unittest.TestCase):
         with self.assertRaises(exceptions.ConflictingTransitionsError):
             self.interpreter.execute_once()
 
+    def test_conflicting_transitions_after_rotation(self):
+        self.interpreter.queue(Event('nextA')).execute_once()
+
+        statechart = self.interpreter.statechart
+        transition = statechart.transitions_for('initial2', 'nextA')[0]
+        statechart.rotate_transition(transition, new_target='a1')
+
+        interpreter = Interpreter(statechart)
+        interpreter.execute_once()
+        with self.assertRaises(exceptions.ConflictingTransitionsError):
+            interpreter.queue(Event('nextA')).execute_once()
+
     def test_conflicting_transitions_2(self):
         self.interpreter.queue(Event('nextA')).queue(Event('nextB')).queue(Event('conflict2'))
         self.interpreter.execute_once()
@@ -1,3 +1,5 @@
+import copy
+import pickle
 import unittest
 from sismic import io
 from sismic import model
@@ -80,6 +82,9 @@ class TraversalTests(unittest.TestCase):
         self.assertEqual(sorted(self.sc.leaf_for(['s1', 's2'])), ['s1', 's2'])
         self.assertEqual(sorted(self.sc.leaf_for(['s1', 's1b1', 's2'])), ['s1b1', 's2'])
         self.assertEqual(sorted(self.sc.leaf_for(['s1', 's1b', 's1b1'])), ['s1b1'])
+        self.assertEqual(sorted(self.sc.leaf_for(iter(['root', 's1a', 's1b', 's2']))), ['s1a', 's1b', 's2'])
+        with self.assertRaises(exceptions.StatechartError):
+            self.sc.leaf_for(['s1', 'unknown'])
 
     def test_events(self):
         self.assertEqual(self.sc.events_for(), ['click', 'close', 'validate'])
@@ -159,6 +164,107 @@ class ValidateTests(unittest.TestCase):
         self.assertIn('must be a child state', str(cm.exception))
 
 
+class ConfigurationTests(unittest.TestCase):
+    def setUp(self):
+        with open('tests/yaml/composite.yaml') as f:
+            self.sc = io.import_from_yaml(f)
+        self.configuration = model.Configuration(self.sc, ['root', 's1', 's1b', 's1b1'])
+
+    def test_membership(self):
+        self.assertIn('s1b', self.configuration)
+        self.assertNotIn('s2', self.configuration)
+        self.assertNotIn('unknown', self.configuration)
+        self.assertEqual(len(self.configuration), 4)
+        self.assertEqual(set(self.configuration), {'root', 's1', 's1b', 's1b1'})
+
+    def test_add_and_remove(self):
+        self.configuration.remove('s1b1')
+        self.configuration.add('s1b2')
+        self.assertEqual(set(self.configuration), {'root', 's1', 's1b', 's1b2'})
+
+        self.configuration.discard('s2')
+        with self.assertRaises(KeyError):
+            self.configuration.remove('s2')
+        with self.assertRaises(exceptions.StatechartError):
+            self.configuration.add('unknown')
+
+        self.configuration.clear()
+        self.assertEqual(len(self.configuration), 0)
+
+    def test_ordered(self):
+        self.assertEqual(self.configuration.ordered, ['root', 's1', 's1b', 's1b1'])
+        self.configuration.remove('s1b1')
+        self.configuration.add('s1a')
+        self.assertEqual(self.configuration.ordered, ['root', 's1', 's1a', 's1b'])
+
+    def test_copy(self):
+        copy = self.configuration.copy()
+        copy.remove('s1b1')
+        self.assertIn('s1b1', self.configuration)
+        self.assertNotIn('s1b1', copy)
+
+    def test_descendants(self):
+        self.assertEqual(sorted(self.configuration.descendants_for('s1')), ['s1b', 's1b1'])
+        self.assertEqual(self.configuration.descendants_for('s1b1'), [])
+        self.assertEqual(self.configuration.descendants_for('s2'), [])
+
+
+class FreezeTests(unittest.TestCase):
+    def setUp(self):
+        with open('tests/yaml/composite.yaml') as f:
+            self.sc = io.import_from_yaml(f)
+
+    def test_freeze(self):
+        self.assertFalse(self.sc.frozen)
+        self.assertEqual(self.sc.freeze(), self.sc)
+        self.assertTrue(self.sc.frozen)
+
+    def test_freeze_validates(self):
+        self.sc.state_for('s1').initial = 's2'
+        with self.assertRaises(exceptions.StatechartError):
+            self.sc.freeze()
+        self.assertFalse(self.sc.frozen)
+
+    def test_frozen_cannot_be_modified(self):
+        self.sc.freeze()
+        transition = self.sc.transitions[0]
+        modifications = [
+            lambda: self.sc.add_state(model.BasicState('s3'), 'root'),
+            lambda: self.sc.remove_state('s2'),
+            lambda: self.sc.rename_state('s2', 's3'),
+            lambda: self.sc.move_state('s1b1', 's1a'),
+            lambda: self.sc.add_transition(model.Transition('s2', 's1')),
+            lambda: self.sc.remove_transition(transition),
+            lambda: self.sc.rotate_transition(transition, new_target=None),
+        ]
+        for modification in modifications:
+            with self.assertRaises(exceptions.StatechartError) as cm:
+                modification()
+            self.assertIn('frozen', str(cm.exception))
+
+        self.assertIn('s2', self.sc.states)
+        self.assertEqual(self.sc.parent_for('s1b1'), 's1b')
+
+    def test_frozen_queries(self):
+        self.sc.freeze()
+        self.assertEqual(self.sc.root, 'root')
+        self.assertEqual(self.sc.ancestors_for('s1b1'), ['s1b', 's1', 'root'])
+        self.assertEqual(self.sc.depth_for('s1b1'), 4)
+        self.assertEqual(self.sc.least_common_ancestor('s1a', 's1b1'), 's1')
+
+    def test_copies_do_not_share_hierarchy(self):
+        self.sc.freeze()
+        for duplicate in [copy.deepcopy(self.sc), pickle.loads(pickle.dumps(self.sc))]:
+            self.assertTrue(duplicate.frozen)
+            # Cached paths are keyed by the ids of the original transitions
+            self.assertIsNot(duplicate._hierarchy(), self.sc._hierarchy())
+            self.assertEqual(duplicate._hierarchy().paths, {})
+            for transition, original in zip(duplicate.transitions, self.sc.transitions):
+                if transition.target is not None:
+                    self.assertEqual(duplicate._hierarchy().transition_paths(transition),
+                                     self.sc._hierarchy().transition_paths(original))
+
+
 class TransitionsTests(unittest.TestCase):
     def setUp(self):
         with open('tests/yaml/internal.yaml') as f:
@@ -203,6 +309,44 @@ class TransitionsTests(unittest.TestCase):
         self.assertEqual(len(self.sc.transitions_with('next')), 1)
         self.assertEqual(len(self.sc.transitions_with('unknown')), 0)
 
+    def test_transitions_for(self):
+        self.assertEqual(len(self.sc.transitions_for('active', 'next')), 1)
+        self.assertEqual(len(self.sc.transitions_for('active', 'not_next')), 1)
+        self.assertEqual(self.sc.transitions_for('active'), [])
+        self.assertEqual(len(self.sc.transitions_for('s1')), 1)
+        self.assertEqual(self.sc.transitions_for('s1', 'next'), [])
+
+        with self.assertRaises(exceptions.StatechartError):
+            self.sc.transitions_for('unknown')
+
+    def test_transitions_for_is_kept_up_to_date(self):
+        tr = next(t for t in self.sc.transitions if t.source == 's1')
+        self.sc.rotate_transition(tr, new_source='active')
+        self.assertEqual(self.sc.transitions_for('s1'), [])
+        self.assertEqual(self.sc.transitions_for('active'), [tr])
+
+        self.sc.rename_state('active', 'inactive')
+        self.assertEqual(self.sc.transitions_for('inactive'), [tr])
+
+        self.sc.remove_transition(tr)
+        self.assertEqual(self.sc.transitions_for('inactive'), [])
+
+        self.sc.add_transition(tr)
+        self.assertEqual(self.sc.transitions_for('inactive'), [tr])
+
+        self.sc.remove_state('inactive')
+        self.assertEqual(self.sc.transitions_with('next'), [])
+
+    def test_transitions_for_after_event_change(self):
+        tr = self.sc.transitions_for('active', 'next')[0]
+        tr.event = 'renamed'
+        self.assertEqual(self.sc.transitions_for('active', 'next'), [])
+        self.assertEqual(self.sc.transitions_for('active', 'renamed'), [tr])
+
+        self.sc.remove_transition(tr)
+        self.assertEqual(self.sc.transitions_for('active', 'next'), [])
+        self.assertEqual(self.sc.transitions_for('active', 'renamed'), [])
+
 
 class TransitionRotationTests(unittest.TestCase):
     def setUp(self):
@@ -278,6 +422,16 @@ class TransitionRotationTests(unittest.TestCase):
 
         self.sc.validate()
 
+    def test_rotate_updates_paths(self):
+        tr = next(t for t in self.sc.transitions if t.source == 's1')
+        self.assertEqual(self.sc._hierarchy().transition_paths(tr), (('s1', ), ('s2', )))
+
+        self.sc.rotate_transition(tr, new_target='active')
+        self.assertEqual(self.sc._hierarchy().transition_paths(tr), (('s1', ), ('active', )))
+
+        self.sc.rotate_transition(tr, new_source='active', new_target='active')
+        self.assertEqual(self.sc._hierarchy().transition_paths(tr), (('active', ), ('active', )))
+
     def test_rotate_both_with_internal(self):
         tr = next(t for t in self.sc.transitions if t.source == 's1')
 
@@ -545,6 +699,16 @@ class MoveStateTest(unittest.TestCase):
 
         self.sc.validate()
 
+    def test_move_updates_hierarchy(self):
+        self.assertEqual(self.sc.depth_for('s1b'), 3)
+        self.sc.move_state('s1b', 's2')
+        self.assertEqual(self.sc.depth_for('s1b'), 3)
+        self.assertEqual(self.sc.depth_for('s1b1'), 4)
+        self.assertEqual(self.sc.ancestors_for('s1b1'), ['s1b', 's2', 'root'])
+        self.assertNotIn('s1b1', self.sc.descendants_for('s1'))
+        self.assertIn('s1b1', self.sc.descendants_for('s2'))
+        self.assertEqual(self.sc.least_common_ancestor('s1a', 's1b1'), 'root')
+
     def test_move_with_initial(self):
         self.sc.move_state('s1a', 'root')
         self.assertEqual(self.sc.state_for('s1').initial, None)
@@ -1,8 +1,8 @@
 import unittest
-from sismic import io
+from sismic import io, exceptions
 from sismic.interpreter import Interpreter
 from sismic.model import MacroStep, MicroStep, Event, InternalEvent
-from sismic.stories import Story, random_stories_generator, story_from_trace, Pause
+from sismic.stories import Story, random_stories_generator, story_from_trace, tell_in_parallel, Pause
 
 
 class StoryTests(unittest.TestCase):
@@ -43,6 +43,43 @@ class StoryTests(unittest.TestCase):
         self.assertTrue(interpreter.final)
         self.assertEqual(interpreter.time, 5)
 
+    def test_tell_fast_forward(self):
+        with open('tests/yaml/timer.yaml') as f:
+            sc = io.import_from_yaml(f)
+
+        interpreter = Interpreter(sc)
+        trace = Story([Pause(0), Pause(10)]).tell(interpreter, fast_forward=True)
+
+        self.assertTrue(interpreter.final)
+        self.assertEqual(interpreter.time, 10)
+        self.assertEqual([(step.time, step.entered_states) for step in trace],
+                         [(0, ['root', 's1']), (3, ['s2']), (5, ['s3']), (7, ['s4'])])
+
+    def test_tell_without_fast_forward(self):
+        with open('tests/yaml/timer.yaml') as f:
+            sc = io.import_from_yaml(f)
+
+        interpreter = Interpreter(sc)
+        trace = Story([Pause(0), Pause(10)]).tell(interpreter)
+
+        self.assertFalse(interpreter.final)
+        self.assertEqual([(step.time, step.entered_states) for step in trace],
+                         [(0, ['root', 's1']), (10, ['s2'])])
+
+    def test_tell_by_step_fast_forward(self):
+        with open('tests/yaml/timer.yaml') as f:
+            sc = io.import_from_yaml(f)
+
+        interpreter = Interpreter(sc)
+        teller = Story([Pause(0), Pause(4), Pause(2)]).tell_by_step(interpreter, fast_forward=True)
+        self.assertEqual(len(next(teller)[1]), 1)
+        told, steps = next(teller)
+        self.assertEqual(told, Pause(4))
+        self.assertEqual([step.time for step in steps], [3])
+        told, steps = next(teller)
+        self.assertEqual([step.time for step in steps], [5])
+        self.assertEqual(interpreter.time, 6)
+
 
 class RandomStoryTests(unittest.TestCase):
     def setUp(self):
@@ -109,4 +146,53 @@ class StoryFromTraceTests(unittest.TestCase):
         ]
         self.assertListEqual(story_from_trace(trace), [
             Pause(2), Event('a'), Pause(3), Event('b'), Pause(4), Pause(5), Event('d')
-        ])
\ No newline at end of file
+        ])
+
+
+def _current_floor(story, interpreter):
+    story.tell(interpreter)
+    return interpreter.context['current']
+
+
+def _unpicklable_error(story, interpreter):
+    raise ValueError(lambda: None)
+
+
+class TellInParallelTests(unittest.TestCase):
+    def setUp(self):
+        self.stories = [Story([Event('floorSelected', floor=i % 5)]) for i in range(20)]
+
+    def test_traces(self):
+        with open('docs/examples/elevator.yaml') as f:
+            sc = io.import_from_yaml(f)
+        traces = list(tell_in_parallel(sc, self.stories, workers=2, chunksize=3))
+        self.assertEqual(len(traces), 20)
+        for story, trace in zip(self.stories, traces):
+            expected = story.tell(Interpreter(sc))
+            self.assertEqual([(s.event, s.transitions, s.entered_states) for s in trace],
+                             [(s.event, s.transitions, s.entered_states) for s in expected])
+
+    def test_path_and_summaries(self):
+        results = tell_in_parallel('docs/examples/elevator.yaml', iter(self.stories), workers=2,
+                                   tell=_current_floor, initial_context={'current': 1})
+        self.assertEqual(list(results), [i % 5 for i in range(20)])
+
+    def test_partial_consumption(self):
+        stories = random_stories_generator([Event('floorSelected', floor=1)], length=1)
+        results = tell_in_parallel('docs/examples/elevator.yaml', stories, workers=2, chunksize=2,
+                                   tell=_current_floor)
+        self.assertEqual([next(results) for _ in range(5)], [1] * 5)
+        results.close()
+
+    def test_exception(self):
+        with open('docs/examples/elevator_contract.yaml') as f:
+            sc = io.import_from_yaml(f)
+        sc.state_for('movingUp').preconditions[0] = 'current > destination'
+        with self.assertRaises(exceptions.PreconditionError) as cm:
+            list(tell_in_parallel(sc, self.stories, workers=2))
+        self.assertEqual(cm.exception.obj.name, 'movingUp')
+        self.assertEqual(cm.exception.condition, 'current > destination')
+
+        with self.assertRaises(exceptions.ExecutionError) as cm:
+            list(tell_in_parallel(sc, self.stories, workers=2, tell=_unpicklable_error))
+        self.assertIn('Story #0 cannot be told', str(cm.exception))